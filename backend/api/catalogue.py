@@ -0,0 +1,26 @@
+import hashlib
+
+from core.cache import VersionedCache
+from recipes.models import Ingredient, Tag
+from .renderers import FastJSONRenderer
+from .serializers import IngredientSerializer, TagSerializer
+
+
+def render_catalogue(serializer_class, queryset):
+    """Сериализует справочник в JSON и вычисляет ETag по содержимому."""
+
+    body = FastJSONRenderer().render(
+        serializer_class(queryset, many=True).data
+    )
+    return body, '"{}"'.format(hashlib.sha1(body).hexdigest())
+
+
+# Сбрасываются сигналами моделей в recipes.signals и командой importcsv.
+tags_catalogue = VersionedCache(
+    'tags_catalogue',
+    lambda: render_catalogue(TagSerializer, Tag.objects.all())
+)
+ingredients_catalogue = VersionedCache(
+    'ingredients_catalogue',
+    lambda: render_catalogue(IngredientSerializer, Ingredient.objects.all())
+)
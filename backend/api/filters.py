@@ -1,27 +1,83 @@
-from recipes.models import Recipe, Tag
-from django_filters import FilterSet, filters
-from rest_framework.filters import SearchFilter
+from django.core.exceptions import ValidationError
+from recipes.caches import tags_cache
+from recipes.models import Cart, Favorite, Recipe, Tag
+from recipes.search import search_recipes
+from django_filters.fields import ModelMultipleChoiceField
+from django_filters.rest_framework import FilterSet, filters
 
-TAG_LIST = [(mod.slug, mod.name) for mod in Tag.objects.all()]
+
+class CachedTagMultipleChoiceField(ModelMultipleChoiceField):
+    """Проверка слагов тэгов по кэшу процесса без запросов к базе."""
+
+    def _check_values(self, value):
+        tags = tags_cache.get()
+        for slug in value:
+            if slug not in tags:
+                raise ValidationError(
+                    self.error_messages['invalid_choice'],
+                    code='invalid_choice',
+                    params={'value': slug},
+                )
+        return [tags[slug] for slug in set(value)]
+
+
+class CachedTagMultipleChoiceFilter(filters.ModelMultipleChoiceFilter):
+    field_class = CachedTagMultipleChoiceField
 
 
 class RecipeFilter(FilterSet):
-    # name = filters.CharFilter(field_name='name', lookup_expr='contains')
-    tags = filters.MultipleChoiceFilter(
-        lookup_expr='slug',
-        choices=TAG_LIST
+    """Фильтры рецептов.
+
+    Параметр search - полнотекстовый поиск по названию, ингредиентам
+    и тексту рецепта; найденные рецепты сортируются по релевантности.
+    """
+
+    search = filters.CharFilter(method='filter_search')
+    tags = CachedTagMultipleChoiceFilter(
+        field_name='tags__slug',
+        to_field_name='slug',
+        queryset=Tag.objects.all()
+    )
+    is_favorited = filters.BooleanFilter(method='filter_is_favorited')
+    is_in_shopping_cart = filters.BooleanFilter(
+        method='filter_is_in_shopping_cart'
     )
-    is_favorited = filters.CharFilter(field_name='is_favorited')
-    is_in_shopping_cart = filters.CharFilter(field_name='is_in_shopping_cart')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'search')
+
+    def filter_by_user_relation(self, queryset, value,
+                                model, user_field, recipe_field):
+        """Отбор рецептов по связи с текущим пользователем.
+
+        Условие строится как полусоединение pk IN (подзапрос), которое
+        обслуживается составными индексами уникальных ограничений
+        Favorite(favorer, favorite) и Cart(buyer, purchase).
+        """
+
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none() if value else queryset
+        relations = model.objects.filter(
+            **{user_field: user}
+        ).values(recipe_field)
+        if value:
+            return queryset.filter(pk__in=relations)
+        return queryset.exclude(pk__in=relations)
 
-    def tag_filter(self, queryset, name, value):
-        print(name, value)
-        return queryset
+    def filter_is_favorited(self, queryset, name, value):
+        return self.filter_by_user_relation(
+            queryset, value, Favorite, 'favorer', 'favorite'
+        )
 
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self.filter_by_user_relation(
+            queryset, value, Cart, 'buyer', 'purchase'
+        )
 
-class IngredientSearchFilter(SearchFilter):
-    search_param = 'name'
+    def filter_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
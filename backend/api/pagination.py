@@ -0,0 +1,280 @@
+import hashlib
+from base64 import b64decode, b64encode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+COUNT_CACHE_KEY = 'pagination_count:{}'
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по статистике планировщика PostgreSQL.
+
+    Используется только для запросов без условий отбора и только
+    если оценка превышает PAGINATION_COUNT_ESTIMATE_THRESHOLD.
+    """
+
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE relname = %s',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD:
+        return None
+    return int(row[0])
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор, кэширующий общее число объектов.
+
+    Ключ кэша строится по SQL запроса подсчета с условиями фильтров.
+    Аннотации при подсчете отбрасываются. При cache_count=False число
+    считается каждый раз: так подсчитываются списки, зависящие от связей
+    пользователя (избранное, корзина, подписки), чтобы новая связь сразу
+    попадала в count и ссылку next.
+    """
+
+    def __init__(self, *args, cache_count=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_count = cache_count
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        if not self.cache_count:
+            return self.object_list.count()
+        estimate = estimate_count(self.object_list)
+        if estimate is not None:
+            return estimate
+        queryset = self.object_list.values('pk')
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = COUNT_CACHE_KEY.format(hashlib.md5(
+            f'{sql}{params}'.encode()
+        ).hexdigest())
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class FeedCursorPagination(CursorPagination):
+    """Курсорная (keyset) пагинация: стоимость не зависит от глубины.
+
+    В отличие от CursorPagination, которая хранит в курсоре только
+    значение ordering[0] и смещение среди строк с равным значением,
+    курсор кодирует значения всех колонок порядка у крайней строки
+    страницы. Следующая страница отбирается условием на кортеж
+    колонок, поэтому при одинаковых значениях первой колонки
+    (popular, trending) запрос не листает строки смещением.
+    """
+
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+    def get_fields(self, queryset):
+        return [
+            (queryset.model._meta.get_field(name.lstrip('-')),
+             name.startswith('-'))
+            for name in self.ordering
+        ]
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            direction, *values = b64decode(
+                cursor.encode('ascii')
+            ).decode('ascii').split('|')
+            if (direction not in ('n', 'p')
+                    or len(values) != len(self.fields)):
+                raise ValueError(cursor)
+            values = [
+                field.to_python(value)
+                for (field, _), value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in values:
+            raise NotFound(self.invalid_cursor_message)
+        return direction == 'p', values
+
+    def encode_cursor(self, obj, reverse):
+        values = []
+        for field, _ in self.fields:
+            value = getattr(obj, field.attname)
+            values.append(value.isoformat() if hasattr(value, 'isoformat')
+                          else str(value))
+        cursor = b64encode('|'.join(
+            ['p' if reverse else 'n', *values]
+        ).encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor
+        )
+
+    def get_position_filter(self, values, reverse):
+        """Условие "строка после позиции" для кортежа колонок порядка.
+
+        Условие на первую колонку повторено отдельно: по нему СУБД
+        берет диапазон индекса, не разбирая дизъюнкцию.
+        """
+
+        lookups = [
+            (field.name, 'lt' if descending != reverse else 'gt')
+            for field, descending in self.fields
+        ]
+        after = Q()
+        equal = Q()
+        for (name, lookup), value in zip(lookups, values):
+            after |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        name, lookup = lookups[0]
+        return Q(**{f'{name}__{lookup}e': values[0]}) & after
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.fields = self.get_fields(queryset)
+        position = self.decode_cursor(request)
+        reverse = position is not None and position[0]
+        ordering = self.ordering
+        if reverse:
+            ordering = [
+                name[1:] if name.startswith('-') else f'-{name}'
+                for name in ordering
+            ]
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(position[1], reverse)
+            )
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        if not self.page:
+            self.has_next = self.has_previous = False
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+
+class FeedPagination(PageNumberPagination):
+    """Постраничная пагинация с необязательным курсорным режимом.
+
+    По умолчанию используются параметры page и limit. Если в запросе
+    есть параметр cursor (в том числе пустой), ответ строится курсорной
+    пагинацией с порядком из атрибута представления cursor_ordering.
+    Общее число объектов в режиме страниц берется из кэша, если метод
+    представления is_user_scoped_list не сообщает, что список зависит
+    от связей пользователя.
+    """
+
+    page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+    cursor_pagination_class = FeedCursorPagination
+
+    def django_paginator_class(self, object_list, per_page):
+        return CachedCountPaginator(object_list, per_page,
+                                    cache_count=self.cache_count)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        is_user_scoped_list = getattr(view, 'is_user_scoped_list', None)
+        self.cache_count = not (is_user_scoped_list
+                                and is_user_scoped_list())
+        self.cursor_paginator = None
+        if self.cursor_pagination_class.cursor_query_param in (
+            request.query_params
+        ):
+            self.cursor_paginator = self.cursor_pagination_class()
+            ordering = getattr(view, 'cursor_ordering', None)
+            if ordering:
+                self.cursor_paginator.ordering = ordering
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class TimelinePagination:
+    """Курсорная пагинация ленты, собранной из нескольких запросов.
+
+    Курсор кодирует пару (дата публикации, id) последнего рецепта
+    страницы. Ответ повторяет формат CursorPagination; переход
+    возможен только вперед.
+    """
+
+    cursor_query_param = CursorPagination.cursor_query_param
+    invalid_cursor_message = CursorPagination.invalid_cursor_message
+
+    def get_position(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            value, _, recipe_id = b64decode(
+                cursor.encode('ascii')
+            ).decode('ascii').partition('|')
+            pub_date = parse_datetime(value)
+            recipe_id = int(recipe_id)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, recipe_id
+
+    def encode_position(self, request, position):
+        pub_date, recipe_id = position
+        cursor = b64encode(
+            f'{pub_date.isoformat()}|{recipe_id}'.encode('ascii')
+        ).decode('ascii')
+        return replace_query_param(
+            request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    def get_paginated_response(self, request, data, last, has_next):
+        return Response({
+            'next': (self.encode_position(request, last)
+                     if has_next else None),
+            'previous': None,
+            'results': data,
+        })
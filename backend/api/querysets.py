@@ -0,0 +1,88 @@
+from collections import defaultdict
+
+from django.db.models import (BooleanField, Count, Exists, F, IntegerField,
+                              OuterRef, Subquery, Value, Window)
+from django.db.models.functions import Coalesce, RowNumber
+
+from recipes.models import Recipe
+from users.models import CustomUser, Follow
+
+
+def is_subscribed_expression(user):
+    """Выражение «пользователь подписан на автора».
+
+    Для анонимного пользователя подзапрос не строится.
+    """
+
+    if not user.is_authenticated:
+        return Value(False, output_field=BooleanField())
+    return Exists(Follow.objects.filter(
+        user=user,
+        following=OuterRef('pk')
+    ))
+
+
+def get_users_queryset(user):
+    """Пользователи с отметкой о подписке текущего пользователя."""
+
+    return CustomUser.objects.annotate(
+        is_subscribed=is_subscribed_expression(user)
+    )
+
+
+def get_authors_queryset(user):
+    """Авторы с отметкой о подписке и числом рецептов в recipes_count."""
+
+    recipes_count = Recipe.objects.filter(
+        author=OuterRef('pk')
+    ).order_by().values('author').annotate(
+        count=Count('pk')
+    ).values('count')
+    return get_users_queryset(user).annotate(
+        recipes_count=Coalesce(
+            Subquery(recipes_count, output_field=IntegerField()), 0
+        )
+    )
+
+
+def get_recipe_previews(author_ids, limit):
+    """Последние limit рецептов каждого автора одним запросом.
+
+    Рецепты нумеруются оконной функцией ROW_NUMBER() в разрезе автора,
+    отбор по номеру выполняется во внешнем запросе.
+    Возвращает словарь {id автора: [рецепты]}.
+    """
+
+    previews = defaultdict(list)
+    if not author_ids or limit < 1:
+        return previews
+    ranked = Recipe.objects.filter(
+        author__in=author_ids
+    ).only(
+        'id', 'name', 'image', 'cooking_time', 'author_id'
+    ).annotate(
+        preview_rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('pub_date').desc(), F('id').desc()]
+        )
+    )
+    sql, params = ranked.query.sql_with_params()
+    for recipe in Recipe.objects.raw(
+        f'SELECT * FROM ({sql}) ranked '
+        'WHERE ranked.preview_rank <= %s '
+        'ORDER BY ranked.preview_rank',
+        (*params, limit)
+    ):
+        previews[recipe.author_id].append(recipe)
+    return previews
+
+
+def get_recipes_queryset():
+    """Рецепты с автором, присоединенным в основном запросе.
+
+    Отметки пользователя (подписка на автора, избранное, корзина)
+    вычисляются не в запросе, а по множествам из api.relations.
+    """
+
+    return Recipe.objects.select_related('author')
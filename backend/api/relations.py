@@ -0,0 +1,82 @@
+from array import array
+from bisect import bisect_left
+
+from django.db import transaction
+
+from recipes.caches import user_relations_cache
+from recipes.models import Cart, Favorite
+from users.models import Follow
+
+FAVORITES = 'favorites'
+CART = 'cart'
+FOLLOWING = 'following'
+
+
+def contains(ids, value):
+    position = bisect_left(ids, value)
+    return position < len(ids) and ids[position] == value
+
+
+class UserRelations:
+    """Множества id, связанных с пользователем.
+
+    Хранит отсортированные массивы id избранных рецептов, рецептов
+    в корзине и авторов, на которых подписан пользователь.
+    """
+
+    def __init__(self, sets):
+        self.sets = sets
+
+    def is_favorited(self, recipe_id):
+        return contains(self.sets[FAVORITES], recipe_id)
+
+    def is_in_shopping_cart(self, recipe_id):
+        return contains(self.sets[CART], recipe_id)
+
+    def is_subscribed(self, author_id):
+        return contains(self.sets[FOLLOWING], author_id)
+
+
+def sorted_ids(queryset):
+    return array('q', sorted(queryset))
+
+
+def get_relations(user):
+    """Связи пользователя из кэша; при промахе загружаются тремя запросами.
+
+    Ключ берется до загрузки: если связи изменят во время загрузки,
+    результат попадет в устаревшее поколение и не будет прочитан.
+    """
+
+    if not user.is_authenticated:
+        return None
+    key = user_relations_cache.make_key(user.pk, scope=user.pk)
+    sets = user_relations_cache.get(key)
+    if sets is None:
+        sets = {
+            FAVORITES: sorted_ids(Favorite.objects.filter(
+                favorer=user
+            ).values_list('favorite_id', flat=True)),
+            CART: sorted_ids(Cart.objects.filter(
+                buyer=user
+            ).values_list('purchase_id', flat=True)),
+            FOLLOWING: sorted_ids(Follow.objects.filter(
+                user=user
+            ).values_list('following_id', flat=True)),
+        }
+        user_relations_cache.set(key, sets)
+    return UserRelations(sets)
+
+
+def invalidate(user_ids):
+    """Сбрасывает связи пользователей после фиксации транзакции.
+
+    Изменения связей через модели сбрасывают кэш сигналами;
+    функция нужна для изменений в обход сигналов, например bulk_create.
+    """
+
+    def invalidate_relations():
+        for user_id in user_ids:
+            user_relations_cache.invalidate(user_id)
+
+    transaction.on_commit(invalidate_relations)
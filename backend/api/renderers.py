@@ -0,0 +1,187 @@
+import csv
+from io import BytesIO
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+except ImportError:
+    canvas = None
+
+SHOPPING_LIST_TITLE = 'Список ингредиентов для покупки:'
+CSV_HEADER = ('Ингредиент', 'Единицы измерения', 'Количество')
+CHUNK_SIZE = 8192
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer, кодирующий ответы через orjson.
+
+    Вывод совпадает с JSONRenderer в компактном режиме. Даты, Decimal
+    и ленивые строки передаются стандартному кодировщику DRF. Ответы
+    с отступами (browsable API, ?indent=) и данные, которые orjson
+    не кодирует, обрабатываются родительским классом.
+    """
+
+    def use_orjson(self, data, accepted_media_type, renderer_context):
+        return (
+            orjson is not None and data is not None
+            and self.compact and not self.ensure_ascii
+            and self.get_indent(accepted_media_type,
+                                renderer_context or {}) is None
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not self.use_orjson(data, accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=JSONEncoder().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        return ret.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace(
+            '\u2029'.encode(), b'\\u2029'
+        )
+
+
+def chunked(parts, size=CHUNK_SIZE):
+    """Собирает мелкие фрагменты байтов в блоки заданного размера."""
+
+    buffer = bytearray()
+    for part in parts:
+        buffer += part
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый класс для выгрузки списка покупок.
+
+    Строки списка принимаются из генератора и отдаются блоками,
+    поэтому расход памяти не зависит от размера корзины.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            # Сообщения об ошибках (например, 401) выводим как текст.
+            return '\n'.join(
+                f'{key}: {value}' for key, value in data.items()
+            ).encode('utf-8')
+        return b''.join(self.stream(data))
+
+    def stream(self, rows):
+        return chunked(
+            line.encode(self.charset) for line in self.lines(rows)
+        )
+
+    def lines(self, rows):
+        raise NotImplementedError
+
+
+class ShoppingListTxtRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def lines(self, rows):
+        yield f'{SHOPPING_LIST_TITLE}\n'
+        for row in rows:
+            yield (f'- {row["ingredient__name"]} '
+                   f'({row["ingredient__measurement_unit"]}): '
+                   f'{row["total_amount"]}\n')
+
+
+class EchoBuffer:
+    """Псевдо-файл, возвращающий записанную строку вместо хранения."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCsvRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def lines(self, rows):
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(CSV_HEADER)
+        for row in rows:
+            yield writer.writerow((row['ingredient__name'],
+                                   row['ingredient__measurement_unit'],
+                                   row['total_amount']))
+
+
+class ShoppingListPdfRenderer(ShoppingListRenderer):
+    """Выгрузка в PDF.
+
+    Формат PDF требует таблицу смещений в конце файла, поэтому документ
+    собирается в буфере и затем отдается блоками.
+    """
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def get_font(self):
+        if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+            return PDF_FONT_NAME
+        try:
+            pdfmetrics.registerFont(
+                TTFont(PDF_FONT_NAME, settings.PDF_FONT_PATH)
+            )
+        except Exception:
+            return 'Helvetica'
+        return PDF_FONT_NAME
+
+    def stream(self, rows):
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        font = self.get_font()
+        _, height = A4
+        y = height - PDF_MARGIN
+        pdf.setFont(font, PDF_FONT_SIZE)
+        pdf.drawString(PDF_MARGIN, y, SHOPPING_LIST_TITLE)
+        for row in rows:
+            y -= PDF_LINE_HEIGHT
+            if y < PDF_MARGIN:
+                pdf.showPage()
+                pdf.setFont(font, PDF_FONT_SIZE)
+                y = height - PDF_MARGIN
+            pdf.drawString(
+                PDF_MARGIN, y,
+                f'- {row["ingredient__name"]} '
+                f'({row["ingredient__measurement_unit"]}): '
+                f'{row["total_amount"]}'
+            )
+        pdf.save()
+        buffer.seek(0)
+        return iter(lambda: buffer.read(CHUNK_SIZE), b'')
+
+
+SHOPPING_LIST_RENDERERS = [ShoppingListTxtRenderer, ShoppingListCsvRenderer]
+if canvas is not None:
+    SHOPPING_LIST_RENDERERS.append(ShoppingListPdfRenderer)
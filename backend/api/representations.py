@@ -0,0 +1,120 @@
+"""Быстрое построение ответов для сериализаторов чтения.
+
+Функции собирают словари напрямую из объектов моделей, минуя
+пополевую обработку DRF, и повторяют схему и значения, которые
+выдают соответствующие сериализаторы.
+"""
+
+from django.core.files.storage import default_storage
+
+from recipes import images
+
+
+def to_boolean(value):
+    return None if value is None else bool(value)
+
+
+def image_url(image, request, variant=None):
+    """Ссылка на изображение, как ее отдает ImageField.
+
+    Если указан вариант (thumb, card, full) и он уже построен,
+    отдается ссылка на него, иначе - на исходный файл.
+    """
+
+    if not image:
+        return None
+    if variant is not None and images.variants_ready(image.name):
+        url = default_storage.url(images.variant_name(image.name, variant))
+    else:
+        try:
+            url = image.url
+        except AttributeError:
+            return None
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def user_representation(user, is_subscribed):
+    return {
+        'email': user.email,
+        'id': user.id,
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'is_subscribed': to_boolean(is_subscribed),
+    }
+
+
+def tag_representation(tag):
+    return {
+        'id': tag.id,
+        'name': tag.name,
+        'color': tag.color,
+        'slug': tag.slug,
+    }
+
+
+def recipe_ingredient_representation(recipe_ingredient):
+    ingredient = recipe_ingredient.ingredient
+    return {
+        'id': ingredient.id,
+        'name': ingredient.name,
+        'measurement_unit': ingredient.measurement_unit,
+        'amount': recipe_ingredient.amount,
+    }
+
+
+def recipe_representation(recipe, request, relations, variant='full'):
+    """Рецепт с отметками пользователя из api.relations.
+
+    Без relations (анонимный пользователь) отметки избранного
+    и корзины равны None, подписка на автора - False.
+    """
+
+    if relations is None:
+        is_subscribed = False
+        is_favorited = is_in_shopping_cart = None
+    else:
+        is_subscribed = relations.is_subscribed(recipe.author_id)
+        is_favorited = relations.is_favorited(recipe.pk)
+        is_in_shopping_cart = relations.is_in_shopping_cart(recipe.pk)
+    return {
+        'id': recipe.id,
+        'tags': [tag_representation(tag) for tag in recipe.tags.all()],
+        'author': user_representation(recipe.author, is_subscribed),
+        'ingredients': [
+            recipe_ingredient_representation(recipe_ingredient)
+            for recipe_ingredient in recipe.recipe_ingredient.all()
+        ],
+        'is_favorited': is_favorited,
+        'is_in_shopping_cart': is_in_shopping_cart,
+        'name': recipe.name,
+        'image': image_url(recipe.image, request, variant),
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+    }
+
+
+def recipe_mini_representation(recipe, request):
+    return {
+        'id': recipe.id,
+        'name': recipe.name,
+        'image': image_url(recipe.image, request, 'thumb'),
+        'cooking_time': recipe.cooking_time,
+    }
+
+
+def follow_representation(author, recipes, recipes_count):
+    """Автор из подписок с превью рецептов и их общим числом.
+
+    Ссылки на изображения в превью относительные, как и прежде
+    у вложенного RecipeMiniSerializer без контекста запроса.
+    """
+
+    representation = user_representation(author, author.is_subscribed)
+    representation['recipes'] = [
+        recipe_mini_representation(recipe, None) for recipe in recipes
+    ]
+    representation['recipes_count'] = recipes_count
+    return representation
@@ -1,17 +1,24 @@
 # import datetime
+from django.conf import settings
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
-import base64
-from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework.generics import get_object_or_404
 
 from users.models import CustomUser, Follow
+from recipes import images, timeline
+from recipes.matching import match_index_cache
 from recipes.models import (Tag,
                             Ingredient,
                             Recipe,
                             RecipeIngredient,
                             Favorite,
                             Cart)
+from . import representations
+from .querysets import get_recipe_previews
+
+RECIPES_LIMIT = 3
 
 
 class CustomUserSerializer(serializers.ModelSerializer):
@@ -45,6 +52,13 @@ class CustomUserSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
+    def to_representation(self, instance):
+        if not hasattr(instance, 'is_subscribed'):
+            return super().to_representation(instance)
+        return representations.user_representation(
+            instance, instance.is_subscribed
+        )
+
 
 class ChangePasswordSerializer(serializers.Serializer):
     """сериализотор для смены пароля пользователя."""
@@ -70,21 +84,33 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class Base64ImageField(serializers.ImageField):
+    """Изображение, переданное строкой data:image/<формат>;base64,...
+
+    Размер проверяется до декодирования, декодирование идет по частям.
+    Пиксели не декодируются: проверяется только заголовок, остальное
+    делает фоновый поток, строящий варианты изображения.
+    """
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            format, _, imgstr = data.partition(';base64,')
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-        return super().to_internal_value(data)
+            try:
+                data = images.decode_base64(imgstr, 'temp.' + ext)
+            except images.ImageError as error:
+                raise serializers.ValidationError(str(error))
+        file_object = serializers.FileField.to_internal_value(self, data)
+        try:
+            images.check_image(file_object)
+        except images.ImageError as error:
+            raise serializers.ValidationError(str(error))
+        return file_object
 
 
 class WriteRecipeIngredientSerializer(serializers.ModelSerializer):
     """Сериализатор для записи ингредиентов в рецептах"""
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient'
-    )
+    id = serializers.IntegerField()
 
     class Meta:
         model = RecipeIngredient
@@ -109,7 +135,7 @@ class ReadRecipeIngredientSerializer(serializers.ModelSerializer):
 class ReadRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения рецептов."""
 
-    author = CustomUserSerializer(source='annotated_author')
+    author = CustomUserSerializer(read_only=True)
     image = Base64ImageField(required=True, allow_null=True)
     ingredients = ReadRecipeIngredientSerializer(
         many=True,
@@ -129,6 +155,14 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
                             'is_favorited', 'is_in_shopping_cart',
                             'name', 'image', 'text', 'cooking_time')
 
+    def to_representation(self, instance):
+        return representations.recipe_representation(
+            instance,
+            self.context.get('request'),
+            self.context.get('relations'),
+            self.context.get('image_variant', 'full')
+        )
+
 
 class RecipeMiniSerializer(serializers.ModelSerializer):
     """Сериализатор для сокращенного отображения рецептов."""
@@ -140,6 +174,11 @@ class RecipeMiniSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
 
+    def to_representation(self, instance):
+        return representations.recipe_mini_representation(
+            instance, self.context.get('request')
+        )
+
 
 class WriteRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для создания рецептов."""
@@ -158,6 +197,66 @@ class WriteRecipeSerializer(serializers.ModelSerializer):
         fields = ('name', 'author', 'ingredients', 'tags',
                   'image', 'text', 'cooking_time')
 
+    def validate_ingredients(self, value):
+        """Проверка ингредиентов рецепта одним запросом к базе."""
+
+        ids = [item['id'] for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                'Ингредиенты в рецепте не должны повторяться.'
+            )
+        ingredients = Ingredient.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in ingredients]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {missing}.'
+            )
+        return [{'ingredient': ingredients[item['id']],
+                 'amount': item['amount']} for item in value]
+
+    def write_ingredients(self, recipe, ingredients_data):
+        """Синхронизирует ингредиенты рецепта с переданными данными.
+
+        Удаляются, обновляются и создаются только изменившиеся строки,
+        поэтому число запросов не зависит от числа ингредиентов.
+        """
+
+        current = {
+            row.ingredient_id: row for row in
+            RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        new = {item['ingredient'].pk: item for item in ingredients_data}
+        removed = current.keys() - new.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for pk in current.keys() & new.keys():
+            if current[pk].amount != new[pk]['amount']:
+                changed.append(RecipeIngredient(
+                    pk=current[pk].pk, amount=new[pk]['amount']
+                ))
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipe,
+                             ingredient=new[pk]['ingredient'],
+                             amount=new[pk]['amount'])
+            for pk in new.keys() - current.keys()
+        ])
+
+    def update_match_index(self, recipe):
+        """Обновляет рецепт в индексе подбора после фиксации.
+
+        Ингредиенты пишутся bulk_create и bulk_update без сигналов.
+        """
+
+        transaction.on_commit(
+            lambda: match_index_cache.changed([recipe.pk])
+        )
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
@@ -166,18 +265,19 @@ class WriteRecipeSerializer(serializers.ModelSerializer):
             **validated_data
         )
 
-        for ingredient in ingredients_data:
-            RecipeIngredient.objects.create(
-                recipe=recipe_instance,
-                ingredient=ingredient['ingredient'],
-                amount=ingredient['amount']
-            )
-
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipe_instance,
+                             ingredient=ingredient['ingredient'],
+                             amount=ingredient['amount'])
+            for ingredient in ingredients_data
+        ])
         recipe_instance.tags.set(tags_data)
-        recipe_instance.save()
+        timeline.publish(recipe_instance)
+        self.update_match_index(recipe_instance)
 
         return recipe_instance
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
@@ -185,28 +285,58 @@ class WriteRecipeSerializer(serializers.ModelSerializer):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        list_of_recipe_ingr = RecipeIngredient.objects.filter(
-            recipe=self.instance
-        )
-        for res_ingr in list_of_recipe_ingr:
-            res_ingr.delete()
-
-        for ingredient in ingredients_data:
-            RecipeIngredient.objects.create(
-                recipe=self.instance,
-                ingredient=ingredient['ingredient'],
-                amount=ingredient['amount']
-            )
-
+        self.write_ingredients(instance, ingredients_data)
+        self.update_match_index(instance)
         instance.tags.set(tags_data)
-        instance.save()
+        # Записываются только переданные поля: счетчик избранного
+        # и оценка популярности могли измениться в других запросах.
+        # Без них сохраняется название, чтобы отправить post_save -
+        # по нему сбрасываются кэши и поисковые данные рецепта.
+        instance.save(update_fields=list(validated_data) or ['name'])
 
         return self.instance
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            Prefetch('recipe_ingredient',
+                     queryset=RecipeIngredient.objects.select_related(
+                         'ingredient'
+                     )),
+            'tags'
+        )
         return ReadRecipeSerializer(instance=instance).data
 
 
+def get_recipes_limit(context):
+    """Число рецептов в превью подписки из параметра recipes_limit."""
+
+    request = context.get('request')
+    value = request.query_params.get('recipes_limit') if request else None
+    if value is None:
+        return RECIPES_LIMIT
+    try:
+        return max(0, int(value))
+    except ValueError:
+        raise serializers.ValidationError(
+            {'recipes_limit': 'Введите целое число.'}
+        )
+
+
+class FollowListSerializer(serializers.ListSerializer):
+    """Загружает превью рецептов всех авторов страницы одним запросом."""
+
+    def to_representation(self, data):
+        follows = list(data.all() if hasattr(data, 'all') else data)
+        previews = get_recipe_previews(
+            [follow.following_id for follow in follows],
+            get_recipes_limit(self.context)
+        )
+        for follow in follows:
+            follow.following.recipe_previews = previews[follow.following_id]
+        return super().to_representation(follows)
+
+
 class FollowSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения подписок на авторов"""
 
@@ -225,13 +355,28 @@ class FollowSerializer(serializers.ModelSerializer):
         model = Follow
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
                   'is_subscribed', 'recipes', 'recipes_count')
+        list_serializer_class = FollowListSerializer
+
+    def to_representation(self, instance):
+        return representations.follow_representation(
+            instance.following,
+            self.get_recipes(instance),
+            self.get_recipes_count(instance)
+        )
 
     def get_recipes(self, obj):
-        recipes = obj.following.recipes.all()[:3]
-        return RecipeMiniSerializer(recipes, many=True, read_only=True).data
+        recipes = getattr(obj.following, 'recipe_previews', None)
+        if recipes is None:
+            recipes = get_recipe_previews(
+                [obj.following_id], get_recipes_limit(self.context)
+            )[obj.following_id]
+        return recipes
 
     def get_recipes_count(self, obj):
-        return obj.following.recipes.count()
+        recipes_count = getattr(obj.following, 'recipes_count', None)
+        if recipes_count is None:
+            return obj.following.recipes.count()
+        return recipes_count
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
@@ -275,7 +420,8 @@ class SubscribeSerializer(serializers.ModelSerializer):
         return attrs
 
     def to_representation(self, instance):
-        return FollowSerializer(instance=instance).data
+        return FollowSerializer(instance=instance,
+                                context=self.context).data
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -344,4 +490,17 @@ class CartSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         recipe = instance.purchase
-        return RecipeMiniSerializer(instance=recipe).data
\ No newline at end of file
+        return RecipeMiniSerializer(instance=recipe).data
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Список id для пакетного добавления или удаления связей."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_ITEMS
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.caches import shopping_lists_cache
+from recipes.models import RecipeIngredient
+
+
+def aggregate_ingredients(user):
+    """Суммирует ингредиенты рецептов из корзины пользователя.
+
+    Все вычисления выполняются одним сгруппированным запросом
+    Cart -> RecipeIngredient -> Ingredient.
+    """
+
+    return RecipeIngredient.objects.filter(
+        recipe__purchase__buyer=user
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
+
+def get_shopping_list(user):
+    """Возвращает строки списка покупок из кэша.
+
+    При отсутствии записи в кэше список вычисляется заново и сохраняется.
+    Ключ берется до вычисления: если корзину изменят во время расчета,
+    результат попадет в устаревшее поколение и не будет прочитан.
+    """
+
+    key = shopping_lists_cache.make_key(user.pk, scope=user.pk)
+    rows = shopping_lists_cache.get(key)
+    if rows is None:
+        rows = list(aggregate_ingredients(user))
+        shopping_lists_cache.set(key, rows)
+    return rows
+
+
+def invalidate(user_ids):
+    """Сбрасывает списки покупок пользователей после фиксации транзакции.
+
+    Изменения корзин через модели сбрасывают списки сигналами;
+    функция нужна для изменений в обход сигналов, например bulk_create.
+    """
+
+    def invalidate_lists():
+        for user_id in user_ids:
+            shopping_lists_cache.invalidate(user_id)
+
+    transaction.on_commit(invalidate_lists)
@@ -0,0 +1,104 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.views import BulkFavoriteView
+from recipes.models import FeedEntry, Favorite, Recipe
+from users.models import CustomUser
+
+
+class BulkRelationTest(TestCase):
+    """Пакетное добавление связей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(
+            username='user', email='user@example.com'
+        )
+        cls.authors = [
+            CustomUser.objects.create(
+                username=f'author{number}',
+                email=f'author{number}@example.com'
+            )
+            for number in range(4)
+        ]
+        now = timezone.now()
+        cls.recipes = {
+            author.pk: [
+                Recipe.objects.create(
+                    author=author, name=f'Рецепт {number}', text='Текст',
+                    cooking_time=10
+                )
+                for number in range(3)
+            ]
+            for author in cls.authors
+        }
+        for recipes in cls.recipes.values():
+            for days, recipe in enumerate(reversed(recipes)):
+                Recipe.objects.filter(pk=recipe.pk).update(
+                    pub_date=now - timedelta(days=days)
+                )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_concurrent_insert(self):
+        """Связь из параллельной транзакции не считается добавленной."""
+
+        first, second = self.recipes[self.authors[0].pk][:2]
+        Favorite.objects.create(favorer=self.user, favorite=first)
+        # Параллельная транзакция добавила связь после чтения статусов.
+        with mock.patch.object(BulkFavoriteView, 'get_related_ids',
+                               return_value=set()):
+            response = self.client.post(
+                '/api/recipes/favorite/', {'ids': [first.pk, second.pk]},
+                format='json'
+            )
+        self.assertEqual(response.data['results'], [
+            {'id': first.pk, 'status': 'exists'},
+            {'id': second.pk, 'status': 'created'},
+        ])
+        counters = dict(Recipe.objects.filter(
+            pk__in=[first.pk, second.pk]
+        ).values_list('pk', 'times_added_to_favorite'))
+        self.assertEqual(counters, {first.pk: 1, second.pk: 1})
+
+    def test_caches_reset_on_commit(self):
+        recipe = self.recipes[self.authors[0].pk][0]
+        with mock.patch.object(BulkFavoriteView, 'after_add') as after_add:
+            self.client.post('/api/recipes/favorite/', {'ids': [recipe.pk]},
+                             format='json')
+            after_add.assert_not_called()
+            for _, callback in connection.run_on_commit:
+                callback()
+        after_add.assert_called_once_with(self.user, [recipe.pk])
+
+    @override_settings(FEED_BACKFILL_LIMIT=2)
+    def test_backfill(self):
+        """Лента заполняется одним запросом на всех авторов."""
+
+        for authors in (self.authors[:1], self.authors[1:]):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(
+                    '/api/users/subscribe/',
+                    {'ids': [author.pk for author in authors]},
+                    format='json'
+                )
+            feed_queries = [query for query in queries
+                            if 'recipes_recipe' in query['sql']]
+            self.assertEqual(len(feed_queries), 1)
+        self.assertEqual(
+            set(FeedEntry.objects.filter(user=self.user).values_list(
+                'recipe_id', flat=True
+            )),
+            {recipe.pk for recipes in self.recipes.values()
+             for recipe in recipes[-2:]}
+        )
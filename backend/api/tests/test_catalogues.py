@@ -0,0 +1,30 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Tag
+
+
+class CatalogueInvalidationTest(TestCase):
+    """Справочники обновляются после изменения тегов и ингредиентов."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_tags(self):
+        tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                 slug='breakfast')
+        self.assertEqual(len(self.client.get('/api/tags/').json()), 1)
+        tag.name = 'Поздний завтрак'
+        tag.save()
+        self.assertEqual(self.client.get('/api/tags/').json()[0]['name'],
+                         'Поздний завтрак')
+        tag.delete()
+        self.assertEqual(self.client.get('/api/tags/').json(), [])
+
+    def test_ingredients(self):
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        self.assertEqual(len(self.client.get('/api/ingredients/').json()), 1)
+        Ingredient.objects.create(name='Сахар', measurement_unit='г')
+        self.assertEqual(len(self.client.get('/api/ingredients/').json()), 2)
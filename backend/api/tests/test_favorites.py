@@ -0,0 +1,155 @@
+from threading import Barrier, Thread
+
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe
+from users.models import CustomUser
+
+THREADS = 8
+ROUNDS = 5
+
+
+def is_lock_error(error):
+    """Отказ SQLite в блокировке базы.
+
+    SQLite блокирует базу целиком и сразу отклоняет транзакцию,
+    которая после чтения пытается писать, пока пишет другая. Такая
+    транзакция откатывается целиком, на согласованность данных
+    это не влияет.
+    """
+
+    return (connection.vendor == 'sqlite'
+            and isinstance(error, OperationalError))
+
+
+def run_threads(target, args_list):
+    """Запускает target в потоках одновременно.
+
+    Возвращает исключения потоков, кроме отказов SQLite в блокировке.
+    """
+
+    barrier = Barrier(len(args_list))
+    errors = []
+
+    def run(*args):
+        try:
+            barrier.wait()
+            target(*args)
+        except Exception as error:
+            if not is_lock_error(error):
+                errors.append(error)
+        finally:
+            connection.close()
+
+    threads = [Thread(target=run, args=args) for args in args_list]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+class FavoriteCounterConcurrencyTest(TransactionTestCase):
+    """Счетчик избранного не расходится при одновременных запросах."""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('SQLite в памяти не поддерживает запись из '
+                          'нескольких потоков; задайте DB_TEST_NAME.')
+        cache.clear()
+        self.author = CustomUser.objects.create(
+            username='author', email='author@example.com'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Текст', cooking_time=10
+        )
+        self.users = [
+            CustomUser.objects.create(
+                username=f'user{number}', email=f'user{number}@example.com'
+            )
+            for number in range(THREADS)
+        ]
+
+    def assert_counter(self):
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            self.recipe.times_added_to_favorite,
+            Favorite.objects.filter(favorite=self.recipe).count()
+        )
+
+    def test_add_and_remove(self):
+        def toggle(user):
+            for _ in range(ROUNDS):
+                Favorite.objects.create(favorer=user, favorite=self.recipe)
+                Favorite.objects.get(favorer=user,
+                                     favorite=self.recipe).delete()
+            Favorite.objects.create(favorer=user, favorite=self.recipe)
+
+        errors = run_threads(toggle, [(user,) for user in self.users])
+        self.assertEqual(errors, [])
+        self.assertEqual(self.recipe.favorite.count(), THREADS)
+        self.assert_counter()
+
+    def test_remove_same(self):
+        """Одно избранное, удаляемое из нескольких потоков."""
+
+        Favorite.objects.create(favorer=self.users[0], favorite=self.recipe)
+        instances = [
+            (Favorite.objects.get(favorer=self.users[0],
+                                  favorite=self.recipe),)
+            for _ in range(THREADS)
+        ]
+        errors = run_threads(lambda favorite: favorite.delete(), instances)
+        self.assertEqual(errors, [])
+        self.assertFalse(self.recipe.favorite.exists())
+        self.assert_counter()
+
+    def test_bulk_remove_same(self):
+        """Одни и те же связи, удаляемые пакетно из нескольких потоков."""
+
+        for user in self.users[:2]:
+            Favorite.objects.create(favorer=user, favorite=self.recipe)
+
+        def remove(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            response = client.delete('/api/recipes/favorite/',
+                                     {'ids': [self.recipe.pk]},
+                                     format='json')
+            self.assertEqual(response.status_code, 200)
+
+        errors = run_threads(remove, [(self.users[0],)] * (THREADS // 2)
+                             + [(self.users[1],)] * (THREADS // 2))
+        self.assertEqual(errors, [])
+        self.assert_counter()
+
+    def test_edit_while_adding(self):
+        def add(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            response = client.post(
+                f'/api/recipes/{self.recipe.pk}/favorite/'
+            )
+            self.assertEqual(response.status_code, 201)
+
+        def edit():
+            client = APIClient()
+            client.force_authenticate(self.author)
+            for number in range(ROUNDS):
+                response = client.patch(
+                    f'/api/recipes/{self.recipe.pk}/',
+                    {'name': f'Рецепт {number}', 'ingredients': [],
+                     'tags': []},
+                    format='json'
+                )
+                self.assertEqual(response.status_code, 200)
+
+        errors = run_threads(
+            lambda user: edit() if user is None else add(user),
+            [(None,)] + [(user,) for user in self.users]
+        )
+        self.assertEqual(errors, [])
+        self.assert_counter()
@@ -0,0 +1,119 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes import timeline
+from recipes.models import FeedEntry, Recipe
+from users.models import CustomUser, Follow
+
+
+class FeedTest(TestCase):
+    """Лента подписок: записи лент и рецепты, читаемые при запросе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(
+            username='user', email='user@example.com'
+        )
+        cls.pushed, cls.pulled, cls.other = [
+            CustomUser.objects.create(username=name,
+                                      email=f'{name}@example.com')
+            for name in ('pushed', 'pulled', 'other')
+        ]
+        now = timezone.now()
+        cls.recipes = {}
+        for number in range(9):
+            author = (cls.pushed, cls.pulled, cls.other)[number % 3]
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10, fanned_out=author != cls.pulled
+            )
+            # Два рецепта с одной датой: порядок по id.
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(hours=number // 2)
+            )
+            cls.recipes.setdefault(author.pk, []).append(recipe.pk)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def subscribe(self, author):
+        response = self.client.post(f'/api/users/{author.pk}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+
+    def get_feed(self, limit=2):
+        ids = []
+        url, params = '/api/recipes/feed/', {'limit': limit}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), limit)
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            url, params = response.data['next'], None
+        return ids
+
+    def expected(self, *authors):
+        return list(Recipe.objects.filter(author__in=authors).order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+
+    def test_merge(self):
+        self.subscribe(self.pushed)
+        self.subscribe(self.pulled)
+        self.assertEqual(
+            set(FeedEntry.objects.filter(user=self.user).values_list(
+                'recipe_id', flat=True
+            )),
+            set(self.recipes[self.pushed.pk])
+        )
+        for limit in (1, 2, 4, 10):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.get_feed(limit),
+                                 self.expected(self.pushed, self.pulled))
+
+    def test_publish(self):
+        self.subscribe(self.pushed)
+        recipe = Recipe.objects.create(author=self.pushed, name='Новый',
+                                       text='Текст', cooking_time=10)
+        timeline.publish(recipe)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, recipe=recipe
+        ).exists())
+        with override_settings(FEED_FANOUT_MAX_FOLLOWERS=0):
+            pulled = Recipe.objects.create(author=self.pushed, name='Еще',
+                                           text='Текст', cooking_time=10)
+            timeline.publish(pulled)
+        self.assertFalse(pulled.fanned_out)
+        self.assertFalse(FeedEntry.objects.filter(recipe=pulled).exists())
+        self.assertEqual(self.get_feed()[:2], [pulled.pk, recipe.pk])
+
+    def test_unsubscribe(self):
+        self.subscribe(self.pushed)
+        self.subscribe(self.pulled)
+        for author, remaining in ((self.pushed, [self.pulled]),
+                                  (self.pulled, [])):
+            response = self.client.delete(
+                f'/api/users/{author.pk}/subscribe/'
+            )
+            self.assertEqual(response.status_code, 204)
+            self.assertEqual(self.get_feed(), self.expected(*remaining))
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_backfill_failure(self):
+        with mock.patch.object(timeline, 'backfill',
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(f'/api/users/{self.pushed.pk}/subscribe/')
+        self.assertFalse(Follow.objects.filter(user=self.user).exists())
+        self.subscribe(self.pushed)
+        self.assertEqual(self.get_feed(), self.expected(self.pushed))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/feed/', {'cursor': 'x'})
+        self.assertEqual(response.status_code, 404)
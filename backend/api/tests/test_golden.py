@@ -0,0 +1,128 @@
+"""Сравнение ответов чтения с эталонными.
+
+Эталоны в каталоге golden записаны реализацией на вложенных
+сериализаторах DRF и JSONRenderer, до перехода на словари
+из api.representations и FastJSONRenderer. Ответы должны совпадать
+побайтно. Чтобы перезаписать эталоны, запустите тесты
+с переменной окружения UPDATE_GOLDEN=1.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (Cart, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, Tag)
+from users.models import CustomUser, Follow
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), 'golden')
+START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+ANONYMOUS_REQUESTS = {
+    'anonymous_recipes': '/api/recipes/?limit=3',
+    'anonymous_recipes_page': '/api/recipes/?page=2&limit=2',
+    'anonymous_recipes_tags': '/api/recipes/?tags=lunch&tags=dinner',
+    'anonymous_recipe': '/api/recipes/3/',
+    'anonymous_users': '/api/users/',
+    'anonymous_tags': '/api/tags/',
+    'anonymous_ingredients': '/api/ingredients/?name=са',
+}
+USER_REQUESTS = {
+    'user_recipes': '/api/recipes/',
+    'user_recipes_favorited': '/api/recipes/?is_favorited=1',
+    'user_recipes_cart': '/api/recipes/?is_in_shopping_cart=1',
+    'user_recipes_author': '/api/recipes/?author=2',
+    'user_recipe': '/api/recipes/1/',
+    'user_users': '/api/users/',
+    'user_user': '/api/users/3/',
+    'user_me': '/api/users/me/',
+    'user_subscriptions': '/api/users/subscriptions/',
+    'user_subscriptions_limit': '/api/users/subscriptions/?recipes_limit=1',
+}
+
+
+class GoldenOutputTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            CustomUser.objects.create(
+                pk=pk, username=f'user{pk}', email=f'user{pk}@example.com',
+                first_name=f'Имя {pk}', last_name=f'Фамилия {pk}'
+            )
+            for pk in range(1, 5)
+        ]
+        tags = [
+            Tag.objects.create(pk=pk, name=name, color=color, slug=slug)
+            for pk, (name, color, slug) in enumerate((
+                ('Завтрак', '#E26C2D', 'breakfast'),
+                ('Обед', '#49B64E', 'lunch'),
+                ('Ужин', '#8775D2', 'dinner'),
+            ), start=1)
+        ]
+        ingredients = [
+            Ingredient.objects.create(pk=pk, name=name, measurement_unit=unit)
+            for pk, (name, unit) in enumerate((
+                ('Сахар', 'г'),
+                ('Соль', 'по вкусу'),
+                ('Молоко', 'мл'),
+                ('Яйца', 'шт.'),
+                ('Салат "Айсберг"', 'г'),
+            ), start=1)
+        ]
+        for pk in range(1, 8):
+            recipe = Recipe.objects.create(
+                pk=pk, author=users[pk % 3 + 1], name=f'Рецепт «{pk}»',
+                text=f'Описание\nрецепта {pk} — «с кавычками» и \\/.',
+                cooking_time=pk * 5,
+                image=f'recipes/image{pk}.png'
+            )
+            Recipe.objects.filter(pk=pk).update(
+                pub_date=START + timedelta(days=pk % 4, hours=pk)
+            )
+            recipe.tags.set(tags[:pk % 3 + 1])
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=pk * 10 + number)
+                for number, ingredient in enumerate(
+                    ingredients[pk % 2:pk % 2 + 3]
+                )
+            ])
+        user = users[0]
+        for pk in (1, 4, 6):
+            Favorite.objects.create(favorer=user, favorite_id=pk)
+        for pk in (2, 4):
+            Cart.objects.create(buyer=user, purchase_id=pk)
+        for pk in (2, 3):
+            Follow.objects.create(user=user, following_id=pk)
+        Follow.objects.create(user=users[2], following=user)
+        cls.user = user
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_golden(self, client, name, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        path = os.path.join(GOLDEN_DIR, f'{name}.json')
+        if os.getenv('UPDATE_GOLDEN'):
+            os.makedirs(GOLDEN_DIR, exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(response.content)
+        with open(path, 'rb') as file:
+            self.assertEqual(response.content, file.read())
+
+    def test_anonymous(self):
+        client = APIClient()
+        for name, url in ANONYMOUS_REQUESTS.items():
+            with self.subTest(name):
+                self.assert_golden(client, name, url)
+
+    def test_authenticated(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for name, url in USER_REQUESTS.items():
+            with self.subTest(name):
+                self.assert_golden(client, name, url)
@@ -0,0 +1,103 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from api.representations import image_url
+from recipes import images
+from recipes.models import Recipe
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(size=(600, 300), image_format='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 100, 50)).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+class DecodeTest(SimpleTestCase):
+    """Проверки изображения до построения вариантов."""
+
+    def test_wrapped_base64(self):
+        data = make_image()
+        payload = base64.encodebytes(data).decode()
+        self.assertIn('\n', payload)
+        with images.decode_base64(payload, 'image.png') as file:
+            self.assertEqual(file.read(), data)
+
+    @override_settings(IMAGE_MAX_SIZE=100)
+    def test_size_limit(self):
+        payload = base64.b64encode(make_image()).decode()
+        with self.assertRaisesMessage(images.ImageError, '100 байт'):
+            images.decode_base64(payload, 'image.png')
+
+    def test_invalid_base64(self):
+        for payload in ('не base64', 'aGVsbG8=!', 'aGVsbG8'):
+            with self.subTest(payload=payload):
+                with self.assertRaises(images.ImageError):
+                    images.decode_base64(payload, 'image.png')
+
+    def check(self, data):
+        images.check_image(ContentFile(data, name='image'))
+
+    def test_not_image(self):
+        with self.assertRaisesMessage(images.ImageError, 'не является'):
+            self.check(b'text')
+
+    def test_format(self):
+        self.check(make_image())
+        with self.assertRaisesMessage(images.ImageError, 'BMP'):
+            self.check(make_image(image_format='BMP'))
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_pixels(self):
+        with self.assertRaisesMessage(images.ImageError, 'разрешение'):
+            self.check(make_image())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class VariantsTest(SimpleTestCase):
+    """Варианты изображения и ссылки на них."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        images.ready_names.clear()
+        self.name = default_storage.save('recipes/image.png',
+                                         ContentFile(make_image()))
+
+    def tearDown(self):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_generate(self):
+        self.assertFalse(images.variants_ready(self.name))
+        images.generate_variants(self.name)
+        self.assertTrue(images.variants_ready(self.name))
+        for variant, bounds in images.VARIANTS.items():
+            with default_storage.open(
+                images.variant_name(self.name, variant)
+            ) as file, Image.open(file) as image:
+                self.assertEqual(image.format, images.VARIANT_FORMAT)
+                width, height = image.size
+                self.assertLessEqual(width, bounds[0])
+                self.assertLessEqual(height, bounds[1])
+                self.assertAlmostEqual(width / height, 2, delta=0.05)
+
+    def test_url_falls_back_to_original(self):
+        image = Recipe(image=self.name).image
+        self.assertEqual(image_url(image, None, 'card'), image.url)
+        images.generate_variants(self.name)
+        self.assertEqual(
+            image_url(image, None, 'card'),
+            default_storage.url(images.variant_name(self.name, 'card'))
+        )
+        self.assertEqual(image_url(image, None), image.url)
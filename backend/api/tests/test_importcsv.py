@@ -0,0 +1,119 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipes.management.commands import importcsv
+from recipes.models import Ingredient, Tag
+
+INGREDIENTS = [
+    {'name': 'Рис', 'measurement_unit': 'г'},
+    {'name': 'Молоко', 'measurement_unit': 'мл'},
+    {'name': 'Молоко', 'measurement_unit': 'г'},
+    {'name': 'Соль "Экстра", [мелкая]', 'measurement_unit': 'щепотка'},
+]
+TAGS = [
+    {'name': 'Завтрак', 'color': '#E26C2D', 'slug': 'breakfast'},
+    {'name': 'Обед', 'color': '#49B64E', 'slug': 'lunch'},
+]
+
+
+class ImportTest(TestCase):
+    """Загрузка ингредиентов и тэгов командой importcsv."""
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.folder.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+
+    def write_csv(self, name, rows):
+        content = StringIO()
+        csv.writer(content).writerows(row.values() for row in rows)
+        self.write(name, content.getvalue())
+
+    def run_command(self, *args):
+        call_command('importcsv', self.folder.name, *args,
+                     stdout=StringIO())
+
+    def imported(self):
+        return (
+            sorted(Ingredient.objects.values_list('name',
+                                                  'measurement_unit')),
+            sorted(Tag.objects.values_list('slug', 'name', 'color')),
+        )
+
+    def expected(self, tags=TAGS):
+        return (
+            sorted((row['name'], row['measurement_unit'])
+                   for row in INGREDIENTS),
+            sorted((row['slug'], row['name'], row['color']) for row in tags),
+        )
+
+    def test_json_chunks(self):
+        """Объекты, разрезанные границей чтения, собираются целиком."""
+
+        self.write('ingredients.json', json.dumps(INGREDIENTS, indent=2,
+                                                  ensure_ascii=False))
+        self.write('tags.json', json.dumps(TAGS))
+        for size in (1, 3, 7, 64 * 1024):
+            with self.subTest(size=size):
+                Ingredient.objects.all().delete()
+                Tag.objects.all().delete()
+                with mock.patch.object(importcsv, 'JSON_READ_SIZE', size):
+                    self.run_command('--format', 'json', '--batch-size', '3')
+                self.assertEqual(self.imported(), self.expected())
+
+    def test_reimport(self):
+        self.write_csv('ingredients.csv', INGREDIENTS)
+        self.write_csv('tags.csv', TAGS)
+        self.run_command()
+        ingredient_ids = set(Ingredient.objects.values_list('pk', flat=True))
+        changed = [{**TAGS[0], 'name': 'Ранний завтрак'}, TAGS[1]]
+        self.write_csv('tags.csv', changed)
+        self.run_command('--batch-size', '1')
+        self.assertEqual(self.imported(), self.expected(changed))
+        self.assertEqual(
+            set(Ingredient.objects.values_list('pk', flat=True)),
+            ingredient_ids
+        )
+
+    def test_short_csv_row(self):
+        self.write('ingredients.csv', 'Рис,г\n\nМолоко\nСоль,г\n')
+        with self.assertRaisesMessage(CommandError,
+                                      'ingredients.csv: Line 3'):
+            self.run_command('--batch-size', '1')
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_missing_json_field(self):
+        self.write('ingredients.json', json.dumps(
+            [INGREDIENTS[0], {'name': 'Молоко'}]
+        ))
+        with self.assertRaisesMessage(
+            CommandError, 'Record 2: missing fields measurement_unit'
+        ):
+            self.run_command('--batch-size', '1')
+        self.write('ingredients.json', '[{"name": "Рис"}, "Молоко"]')
+        with self.assertRaisesMessage(CommandError, 'Record 1'):
+            self.run_command()
+        self.write('ingredients.json', json.dumps(INGREDIENTS[:1] + ['x']))
+        with self.assertRaisesMessage(CommandError,
+                                      'Record 2: expected an object'):
+            self.run_command()
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_invalid_json(self):
+        for content, message in (('{}', 'must contain an array'),
+                                 ('[{"name": "Рис"', 'Unexpected end')):
+            with self.subTest(content=content):
+                self.write('ingredients.json', content)
+                with self.assertRaisesMessage(CommandError, message):
+                    self.run_command()
@@ -0,0 +1,28 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient
+
+
+class IngredientSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create([
+            Ingredient(name='Соль', measurement_unit='г'),
+            Ingredient(name='соль', measurement_unit='по вкусу'),
+            Ingredient(name='Соль', measurement_unit='щепотка'),
+            Ingredient(name='Морская соль', measurement_unit='г'),
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_same_names(self):
+        response = APIClient().get('/api/ingredients/', {'name': 'сол'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['measurement_unit'] for item in response.data],
+            ['г', 'по вкусу', 'щепотка', 'г']
+        )
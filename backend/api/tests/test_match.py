@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from recipes.matching import load_match_index, match_index_cache
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import CustomUser
+
+
+class MatchIndexUpdateTest(TransactionTestCase):
+    """Изменение рецепта обновляет индекс подбора без полной загрузки."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create(
+            username='author', email='author@example.com'
+        )
+        self.tag = Tag.objects.create(name='Обед', color='#E26C2D',
+                                      slug='lunch')
+        self.rice, self.carrot, self.onion = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Рис', 'Морковь', 'Лук')
+        ]
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Плов', text='Текст', cooking_time=60
+        )
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=self.recipe, ingredient=ingredient,
+                             amount=10)
+            for ingredient in (self.rice, self.carrot)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def match(self, *ingredients):
+        return [
+            (recipe['id'], recipe['match_ratio']) for recipe in
+            self.client.get('/api/recipes/match/', {
+                'ingredients': ','.join(str(item.pk) for item in ingredients)
+            }).json()
+        ]
+
+    def edit(self, **data):
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.pk}/',
+            {'ingredients': [], 'tags': [self.tag.pk], **data},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_updates(self):
+        self.assertEqual(self.match(self.rice), [(self.recipe.pk, 0.5)])
+        with mock.patch.object(match_index_cache, 'loader',
+                               wraps=load_match_index) as loader:
+            self.edit(name='Плов с луком', ingredients=[
+                {'id': self.rice.pk, 'amount': 10},
+                {'id': self.onion.pk, 'amount': 5},
+            ])
+            self.assertEqual(self.match(self.rice),
+                             [(self.recipe.pk, 0.5)])
+            self.assertEqual(self.match(self.carrot), [])
+            self.assertEqual(self.match(self.rice, self.onion),
+                             [(self.recipe.pk, 1.0)])
+            self.onion.delete()
+            self.assertEqual(self.match(self.rice),
+                             [(self.recipe.pk, 1.0)])
+            self.client.delete(f'/api/recipes/{self.recipe.pk}/')
+            self.assertEqual(self.match(self.rice), [])
+        loader.assert_not_called()
@@ -0,0 +1,143 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Cart, Favorite, Recipe
+from users.models import CustomUser, Follow
+
+
+class UserScopedCountTest(TestCase):
+    """Число объектов списков по связям пользователя не кэшируется."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(
+            username='user', email='user@example.com'
+        )
+        cls.authors = [
+            CustomUser.objects.create(
+                username=f'author{number}',
+                email=f'author{number}@example.com'
+            )
+            for number in range(7)
+        ]
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10
+            )
+            for number, author in enumerate(cls.authors)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_new_item_reachable(self, url, params, model, **fields):
+        for item in range(6):
+            model.objects.create(**{
+                name: value[item] for name, value in fields.items()
+            })
+        response = self.client.get(url, {**params, 'limit': 6})
+        self.assertEqual(response.data['count'], 6)
+        self.assertIsNone(response.data['next'])
+        model.objects.create(**{
+            name: value[6] for name, value in fields.items()
+        })
+        response = self.client.get(url, {**params, 'limit': 6})
+        self.assertEqual(response.data['count'], 7)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_favorites(self):
+        self.assert_new_item_reachable(
+            '/api/recipes/', {'is_favorited': 1}, Favorite,
+            favorer=[self.user] * 7, favorite=self.recipes
+        )
+
+    def test_shopping_cart(self):
+        self.assert_new_item_reachable(
+            '/api/recipes/', {'is_in_shopping_cart': 1}, Cart,
+            buyer=[self.user] * 7, purchase=self.recipes
+        )
+
+    def test_subscriptions(self):
+        self.assert_new_item_reachable(
+            '/api/users/subscriptions/', {}, Follow,
+            user=[self.user] * 7, following=self.authors
+        )
+
+    def test_unfiltered_count_is_cached(self):
+        response = self.client.get('/api/recipes/', {'limit': 6})
+        self.assertEqual(response.data['count'], len(self.recipes))
+        Recipe.objects.create(author=self.user, name='Новый рецепт',
+                              text='Текст', cooking_time=10)
+        response = self.client.get('/api/recipes/', {'limit': 6})
+        self.assertEqual(response.data['count'], len(self.recipes))
+
+
+class KeysetCursorTest(TestCase):
+    """Курсор хранит значения всех колонок порядка, а не смещение."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create(
+            username='author', email='author@example.com'
+        )
+        # Много рецептов с одинаковым числом добавлений в избранное.
+        Recipe.objects.bulk_create([
+            Recipe(author=author, name=f'Рецепт {number}', text='Текст',
+                   cooking_time=10, times_added_to_favorite=number // 7)
+            for number in range(21)
+        ])
+        cls.expected = list(Recipe.objects.order_by(
+            '-times_added_to_favorite', '-id'
+        ).values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_pages(self, url, params):
+        ids = []
+        pages = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append((url, queries))
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            url, params = response.data['next'], None
+        return ids, pages
+
+    def test_ties(self):
+        ids, pages = self.get_pages(
+            '/api/recipes/', {'ordering': 'popular', 'limit': 2, 'cursor': ''}
+        )
+        self.assertEqual(ids, self.expected)
+        first_queries = len(pages[0][1])
+        for _, queries in pages[1:]:
+            self.assertEqual(len(queries), first_queries)
+            for query in queries:
+                self.assertNotIn('OFFSET', query['sql'])
+
+    def test_previous(self):
+        params = {'ordering': 'popular', 'limit': 4, 'cursor': ''}
+        first = self.client.get('/api/recipes/', params).data
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).data
+        third = self.client.get(second['next']).data
+        back = self.client.get(third['previous']).data
+        self.assertEqual(back['results'], second['results'])
+        back = self.client.get(back['previous']).data
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('x', 'bnwx', 'bnx8MQ=='):
+            response = self.client.get(
+                '/api/recipes/', {'ordering': 'popular', 'cursor': cursor}
+            )
+            self.assertEqual(response.status_code, 404)
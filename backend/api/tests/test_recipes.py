@@ -0,0 +1,223 @@
+import base64
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import relations
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import CustomUser
+
+MEDIA_ROOT = tempfile.mkdtemp()
+# Изображение PNG 1x1.
+IMAGE = 'data:image/png;base64,' + base64.b64encode(bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360f8cfc0f01f0005000201a1b5e3'
+    '280000000049454e44ae426082'
+)).decode()
+# Запросы записи рецепта с тремя тегами, без учета числа ингредиентов:
+# теги загружаются по одному.
+CREATE_QUERIES = 15
+UPDATE_QUERIES = 17
+# Страница списка: число рецептов, рецепты, ингредиенты, теги.
+LIST_QUERIES = 4
+# Фильтр по тегу или автору добавляет запрос тегов или автора.
+FILTERED_LIST_QUERIES = 5
+LIST_SIZE = 60
+PAGE_SIZES = (1, 6, 20, 50)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeWriteQueriesTest(TestCase):
+    """Число запросов записи рецепта не зависит от числа ингредиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create(
+            username='author', email='author@example.com'
+        )
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', color=f'#00000{number}',
+                               slug=f'tag{number}')
+            for number in range(3)
+        ]
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(100)
+        ])
+        cls.ingredients = list(Ingredient.objects.order_by('pk'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        relations.get_relations(self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def get_data(self, ingredients, amount):
+        return {
+            'name': 'Рецепт',
+            'text': 'Текст',
+            'cooking_time': 10,
+            'image': IMAGE,
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': amount}
+                for ingredient in ingredients
+            ],
+        }
+
+    def test_create(self):
+        for count in (1, 50):
+            with self.subTest(ingredients=count):
+                with self.assertNumQueries(CREATE_QUERIES):
+                    response = self.client.post(
+                        '/api/recipes/',
+                        self.get_data(self.ingredients[:count], 10),
+                        format='json'
+                    )
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(len(response.data['ingredients']), count)
+
+    def test_update(self):
+        for count in (2, 50):
+            with self.subTest(ingredients=count):
+                recipe = self.client.post(
+                    '/api/recipes/',
+                    self.get_data(self.ingredients[:count], 10),
+                    format='json'
+                ).data
+                # Половина ингредиентов удаляется, у второй половины
+                # меняется количество, добавляются новые.
+                ingredients = self.ingredients[count // 2:count * 3 // 2]
+                with self.assertNumQueries(UPDATE_QUERIES):
+                    response = self.client.patch(
+                        f'/api/recipes/{recipe["id"]}/',
+                        self.get_data(ingredients, 20), format='json'
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [item['id'] for item in response.data['ingredients']],
+                    [ingredient.pk for ingredient in ingredients]
+                )
+                self.assertEqual(
+                    RecipeIngredient.objects.filter(
+                        recipe_id=recipe['id'], amount=20
+                    ).count(),
+                    count
+                )
+
+
+class RecipeListQueriesTest(TestCase):
+    """Число запросов страницы /api/recipes/ не зависит от ее размера."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(
+            username='user', email='user@example.com'
+        )
+        authors = [
+            CustomUser.objects.create(
+                username=f'author{number}',
+                email=f'author{number}@example.com'
+            )
+            for number in range(5)
+        ]
+        tags = [
+            Tag.objects.create(name=f'Тег {number}',
+                               color=f'#00000{number}', slug=f'tag{number}')
+            for number in range(3)
+        ]
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(20)
+        ])
+        ingredients = list(Ingredient.objects.order_by('pk'))
+        for number in range(LIST_SIZE):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}', text='Текст', cooking_time=10,
+                image='recipes/image.png'
+            )
+            recipe.tags.set(tags[:number % len(tags) + 1])
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=number + 1)
+                for ingredient in ingredients[:number % 10 + 1]
+            ])
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_page_queries(self, client, user=None):
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                cache.clear()
+                if user is not None:
+                    relations.get_relations(user)
+                with self.assertNumQueries(LIST_QUERIES):
+                    response = client.get('/api/recipes/', {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous(self):
+        self.assert_page_queries(APIClient())
+
+    def test_authenticated(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assert_page_queries(client, self.user)
+
+    def test_filtered(self):
+        client = APIClient()
+        author = CustomUser.objects.get(username='author0')
+        for params in ({'tags': 'tag0'}, {'author': author.pk}):
+            for limit in PAGE_SIZES:
+                with self.subTest(limit=limit, **params):
+                    cache.clear()
+                    with self.assertNumQueries(FILTERED_LIST_QUERIES):
+                        response = client.get(
+                            '/api/recipes/', {**params, 'limit': limit}
+                        )
+                    self.assertEqual(len(response.data['results']),
+                                     min(limit, response.data['count']))
+
+
+class AnonymousCacheTest(TestCase):
+    """Записи кэша анонимных ответов различаются по хосту и типу ответа."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create(
+            username='author', email='author@example.com'
+        )
+        for number in range(2):
+            Recipe.objects.create(author=author, name=f'Рецепт {number}',
+                                  text='Текст', cooking_time=10)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_host(self):
+        for host in ('localhost', '127.0.0.1', 'localhost'):
+            response = self.client.get('/api/recipes/', {'limit': 1},
+                                       HTTP_HOST=host)
+            self.assertTrue(
+                response.json()['next'].startswith(f'http://{host}/')
+            )
+            self.assertIn('Host', response['Vary'])
+
+    def test_accept(self):
+        for accept, indented in (('application/json', False),
+                                 ('application/json; indent=2', True),
+                                 ('application/json', False)):
+            response = self.client.get('/api/recipes/', HTTP_ACCEPT=accept)
+            self.assertEqual(b'\n' in response.content, indented)
+            self.assertIn('Accept', response['Vary'])
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe
+from users.models import CustomUser
+
+
+class RelationFlagsTest(TransactionTestCase):
+    """Отметки рецептов обновляются после изменения связей."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(
+            username='user', email='user@example.com'
+        )
+        self.author = CustomUser.objects.create(
+            username='author', email='author@example.com'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Текст', cooking_time=10
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_flags(self):
+        data = self.client.get(f'/api/recipes/{self.recipe.pk}/').json()
+        return (data['is_favorited'], data['is_in_shopping_cart'],
+                data['author']['is_subscribed'])
+
+    def test_single_endpoints(self):
+        self.assertEqual(self.get_flags(), (False, False, False))
+        self.client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.client.post(f'/api/recipes/{self.recipe.pk}/shopping_cart/')
+        self.client.post(f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(self.get_flags(), (True, True, True))
+        self.client.delete(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.client.delete(f'/api/recipes/{self.recipe.pk}/shopping_cart/')
+        self.client.delete(f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(self.get_flags(), (False, False, False))
+
+    def test_bulk_endpoints(self):
+        self.assertEqual(self.get_flags(), (False, False, False))
+        ids = {'ids': [self.recipe.pk]}
+        self.client.post('/api/recipes/favorite/', ids, format='json')
+        self.client.post('/api/recipes/shopping_cart/', ids, format='json')
+        self.client.post('/api/users/subscribe/', {'ids': [self.author.pk]},
+                         format='json')
+        self.assertEqual(self.get_flags(), (True, True, True))
+        self.client.delete('/api/recipes/favorite/', ids, format='json')
+        self.client.delete('/api/recipes/shopping_cart/', ids, format='json')
+        self.client.delete('/api/users/subscribe/',
+                           {'ids': [self.author.pk]}, format='json')
+        self.assertEqual(self.get_flags(), (False, False, False))
+
+    def test_model_changes(self):
+        self.assertEqual(self.get_flags(), (False, False, False))
+        favorite = Favorite.objects.create(favorer=self.user,
+                                           favorite=self.recipe)
+        self.assertEqual(self.get_flags(), (True, False, False))
+        favorite.delete()
+        self.assertEqual(self.get_flags(), (False, False, False))
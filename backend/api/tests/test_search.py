@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from recipes import search
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import CustomUser
+
+
+class RecipeSearchTest(TransactionTestCase):
+    """Поиск и подбор рецептов после изменения ингредиентов."""
+
+    def setUp(self):
+        cache.clear()
+        author = CustomUser.objects.create(
+            username='author', email='author@example.com'
+        )
+        self.saffron = Ingredient.objects.create(name='Шафран',
+                                                 measurement_unit='г')
+        self.rice = Ingredient.objects.create(name='Рис',
+                                              measurement_unit='г')
+        self.recipe = Recipe.objects.create(
+            author=author, name='Плов', text='Текст', cooking_time=60
+        )
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=self.recipe, ingredient=ingredient,
+                             amount=10)
+            for ingredient in (self.saffron, self.rice)
+        ])
+        self.client = APIClient()
+
+    def search(self, query):
+        return [
+            recipe['id'] for recipe in
+            self.client.get('/api/recipes/', {'search': query}).json()[
+                'results'
+            ]
+        ]
+
+    def match(self, *ingredients):
+        return self.client.get('/api/recipes/match/', {
+            'ingredients': ','.join(str(item.pk) for item in ingredients)
+        }).json()
+
+    def test_delete(self):
+        self.assertEqual(self.search('шафран'), [self.recipe.pk])
+        self.assertEqual(self.match(self.rice)[0]['match_ratio'], 0.5)
+        self.saffron.delete()
+        self.assertEqual(self.search('шафран'), [])
+        self.assertEqual(self.search('рис'), [self.recipe.pk])
+        self.assertEqual(self.match(self.rice)[0]['match_ratio'], 1.0)
+
+    def test_prefix(self):
+        self.assertEqual(self.search('пло'), [self.recipe.pk])
+        self.assertEqual(self.search('пло ри'), [self.recipe.pk])
+        self.assertEqual(self.search('лов'), [])
+
+    def test_search_rejects_cursor(self):
+        response = self.client.get('/api/recipes/',
+                                   {'search': 'плов', 'cursor': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json())
+
+
+class PostgreSQLSearchTest(SimpleTestCase):
+    """Запросы полнотекстового поиска PostgreSQL."""
+
+    def test_prefix_query(self):
+        query = search.get_search_query('Бор, щ!')
+        self.assertEqual(query.value, 'бор:* & щ:*')
+        self.assertEqual(query.search_type, 'raw')
+        self.assertIsNone(search.get_search_query('!?'))
+
+    def test_update_vectors_single_query(self):
+        with mock.patch.object(search, 'connections') as connections:
+            search.update_vectors(range(1, 1001))
+        cursor = connections['default'].cursor.return_value.__enter__()
+        cursor.execute.assert_called_once()
+        sql, params = cursor.execute.call_args[0]
+        self.assertIn('WHERE id = ANY', sql)
+        self.assertEqual(params['ids'], list(range(1, 1001)))
@@ -0,0 +1,176 @@
+import os
+from time import perf_counter
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, tag
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Cart, Ingredient, Recipe, RecipeIngredient
+from users.models import CustomUser
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+CART_SIZES = (1, 10, 50, 200)
+INGREDIENTS_PER_RECIPE = 10
+
+
+class ShoppingListBenchmark(TestCase):
+    """Число запросов и время скачивания списка покупок
+    в зависимости от размера корзины.
+
+    Число запросов не должно зависеть от размера корзины. Таблица
+    времени выводится только при BENCHMARK=1:
+    BENCHMARK=1 python manage.py test --tag benchmark
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create(
+            username='author', email='author@example.com'
+        )
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(100)
+        ])
+        cls.ingredients = list(Ingredient.objects.order_by('pk'))
+        recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10, image='recipes/image.png'
+            )
+            for number in range(max(CART_SIZES))
+        ]
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=cls.ingredients[
+                    (number + shift) % len(cls.ingredients)
+                ],
+                amount=shift + 1
+            )
+            for number, recipe in enumerate(recipes)
+            for shift in range(INGREDIENTS_PER_RECIPE)
+        ])
+        cls.buyers = {}
+        for size in CART_SIZES:
+            buyer = CustomUser.objects.create(
+                username=f'buyer{size}', email=f'buyer{size}@example.com'
+            )
+            Cart.objects.bulk_create([
+                Cart(buyer=buyer, purchase=recipe)
+                for recipe in recipes[:size]
+            ])
+            cls.buyers[size] = buyer
+
+    def setUp(self):
+        cache.clear()
+
+    def download(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            start = perf_counter()
+            response = client.get(DOWNLOAD_URL)
+            content = b''.join(response.streaming_content)
+            elapsed = perf_counter() - start
+        self.assertEqual(response.status_code, 200)
+        return content, len(queries), elapsed
+
+    def measure(self):
+        """Скачивание для каждой корзины: без кэша и повторное."""
+
+        results = []
+        for size in CART_SIZES:
+            buyer = self.buyers[size]
+            content, cold_queries, cold_time = self.download(buyer)
+            _, warm_queries, warm_time = self.download(buyer)
+            results.append(
+                (size, cold_queries, cold_time, warm_queries, warm_time)
+            )
+            self.assertIn('Ингредиент 0 (г)'.encode(), content)
+        return results
+
+    def test_queries_do_not_depend_on_cart_size(self):
+        results = self.measure()
+        self.assertEqual(len({row[1] for row in results}), 1)
+        self.assertEqual(len({row[3] for row in results}), 1)
+        self.assertEqual(results[0][3], 0)
+
+    @tag('benchmark')
+    @skipUnless(os.environ.get('BENCHMARK'), 'Таблица времени: BENCHMARK=1.')
+    def test_timings(self):
+        print('\nРецептов  запросов  время, мс  запросов*  время*, мс')
+        for size, cold_queries, cold_time, warm_queries, warm_time in (
+            self.measure()
+        ):
+            print(f'{size:>8}  {cold_queries:>8}  {cold_time * 1000:>9.1f}'
+                  f'  {warm_queries:>9}  {warm_time * 1000:>10.1f}')
+        print('* - повторное скачивание из кэша')
+
+    def test_amounts_are_summed(self):
+        buyer = self.buyers[10]
+        content, _, _ = self.download(buyer)
+        total = sum(
+            shift + 1
+            for number in range(10)
+            for shift in range(INGREDIENTS_PER_RECIPE)
+            if (number + shift) % len(self.ingredients) == 9
+        )
+        self.assertIn(f'Ингредиент 9 (г): {total}'.encode(), content)
+
+
+class ShoppingListCacheTest(TransactionTestCase):
+    """Кэш списка покупок сбрасывается при изменении данных."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(
+            username='buyer', email='buyer@example.com'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.user, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10
+            )
+            for number in range(2)
+        ]
+        for recipe in self.recipes:
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=self.ingredient, amount=100
+            )
+
+    def download(self):
+        return b''.join(
+            self.client.get(DOWNLOAD_URL).streaming_content
+        ).decode()
+
+    def test_cart_changes(self):
+        self.client.post(f'/api/recipes/{self.recipes[0].pk}/shopping_cart/')
+        self.assertIn('Мука (г): 100', self.download())
+        self.client.post(f'/api/recipes/{self.recipes[1].pk}/shopping_cart/')
+        self.assertIn('Мука (г): 200', self.download())
+        self.client.delete(
+            f'/api/recipes/{self.recipes[0].pk}/shopping_cart/'
+        )
+        self.assertIn('Мука (г): 100', self.download())
+        Cart.objects.filter(buyer=self.user).delete()
+        self.assertNotIn('Мука', self.download())
+
+    def test_ingredient_and_recipe_changes(self):
+        Cart.objects.create(buyer=self.user, purchase=self.recipes[0])
+        self.assertIn('Мука (г): 100', self.download())
+        self.ingredient.name = 'Мука пшеничная'
+        self.ingredient.save()
+        self.assertIn('Мука пшеничная (г): 100', self.download())
+        RecipeIngredient.objects.filter(
+            recipe=self.recipes[0]
+        ).update(amount=150)
+        self.recipes[0].save()
+        self.assertIn('Мука пшеничная (г): 150', self.download())
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from recipes import trending
+from recipes.models import Cart, Favorite, Recipe
+from users.models import CustomUser
+
+NOW_PATH = 'recipes.management.commands.update_trending.timezone.now'
+
+
+class TrendingTest(TestCase):
+    """Оценки для сортировки ordering=trending."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create(
+            username='author', email='author@example.com'
+        )
+        cls.users = [
+            CustomUser.objects.create(username=f'user{number}',
+                                      email=f'user{number}@example.com')
+            for number in range(4)
+        ]
+        cls.old, cls.new, cls.quiet = [
+            Recipe.objects.create(author=author, name=name, text='Текст',
+                                  cooking_time=10)
+            for name in ('Старый', 'Новый', 'Тихий')
+        ]
+        cls.now = timezone.now()
+
+    def setUp(self):
+        cache.clear()
+
+    def add(self, model, recipe, user, hours_ago):
+        fields = ({'favorer': user, 'favorite': recipe} if model is Favorite
+                  else {'buyer': user, 'purchase': recipe})
+        event = model.objects.create(**fields)
+        model.objects.filter(pk=event.pk).update(
+            created=self.now - timedelta(hours=hours_ago)
+        )
+
+    def scores(self):
+        return dict(Recipe.objects.values_list('pk', 'trending_score'))
+
+    def run_command(self, at, full=False):
+        with mock.patch(NOW_PATH, return_value=at):
+            call_command('update_trending', *(['--full'] if full else []),
+                         stdout=StringIO())
+
+    def test_recent_events_rank_higher(self):
+        for user in self.users:
+            self.add(Favorite, self.old, user, hours_ago=24 * 10)
+        self.add(Favorite, self.new, self.users[0], hours_ago=1)
+        self.add(Cart, self.new, self.users[0], hours_ago=2)
+        trending.update_trending_scores(until=self.now)
+        self.assertEqual(
+            list(Recipe.objects.order_by('-trending_score', '-id')),
+            [self.new, self.old, self.quiet]
+        )
+        self.assertEqual(self.scores()[self.quiet.pk], 0)
+
+    def test_incremental_matches_full(self):
+        self.add(Favorite, self.old, self.users[0], hours_ago=30)
+        self.add(Cart, self.new, self.users[1], hours_ago=20)
+        self.run_command(self.now - timedelta(hours=10))
+        self.add(Favorite, self.old, self.users[1], hours_ago=5)
+        self.add(Favorite, self.new, self.users[2], hours_ago=4)
+        self.run_command(self.now)
+        incremental = self.scores()
+        self.run_command(self.now, full=True)
+        for pk, score in self.scores().items():
+            self.assertAlmostEqual(incremental[pk], score)
+
+    def test_late_commit(self):
+        """Событие, зафиксированное после запуска, учитывается позже."""
+
+        self.run_command(self.now)
+        # Дата добавления раньше запуска, фиксация - после него.
+        self.add(Favorite, self.quiet, self.users[0], hours_ago=0.01)
+        self.run_command(self.now + timedelta(minutes=5))
+        self.assertGreater(self.scores()[self.quiet.pk], 0)
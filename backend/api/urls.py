@@ -9,6 +9,9 @@ from .views import (CustomUserViewSet,
                     SubscriptionsViewSet,
                     FavoriteViewSet,
                     CartViewSet,
+                    BulkFavoriteView,
+                    BulkCartView,
+                    BulkSubscribeView,
                     download_purchase_list)
 
 
@@ -37,5 +40,8 @@ router.register(r'recipes/(?P<recipe_id>\d+)/shopping_cart',
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
     path('recipes/download_shopping_cart/', download_purchase_list),
+    path('recipes/favorite/', BulkFavoriteView.as_view()),
+    path('recipes/shopping_cart/', BulkCartView.as_view()),
+    path('users/subscribe/', BulkSubscribeView.as_view()),
     path('', include(router.urls)),
 ]
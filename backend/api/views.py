@@ -1,16 +1,31 @@
-from django.http import FileResponse
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Exists, OuterRef, Prefetch, Case, When, BooleanField, Value
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch
 from rest_framework import permissions, status, viewsets
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import (action, api_view,
+                                       permission_classes,
+                                       renderer_classes)
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError
-from recipes.models import Tag, Ingredient, Recipe, Favorite, Cart
+from rest_framework.settings import api_settings
+from recipes.caches import ingredient_index_cache, recipe_responses_cache
+from recipes import timeline
+from recipes.matching import match_index_cache
+from recipes.models import (Tag, Ingredient, Recipe, RecipeIngredient,
+                            Favorite, Cart)
 from users.models import CustomUser, Follow
-from core.mixins import UserMixin, ReadOnlyMixin, CreateDestroyMixin, ListMixin
+from core.mixins import (UserMixin, ReadOnlyMixin, CreateDestroyMixin,
+                         ListMixin, CatalogueMixin, AnonymousCacheMixin)
 from .permissions import UserPermission, RecipePermission
-from .filters import RecipeFilter, IngredientSearchFilter
+from .catalogue import ingredients_catalogue, tags_catalogue
+from .filters import RecipeFilter
+from .pagination import FeedPagination, TimelinePagination
+from .querysets import (get_authors_queryset, get_recipes_queryset,
+                        get_users_queryset)
 from .serializers import (CustomUserSerializer,
                           ChangePasswordSerializer,
                           TagSerializer,
@@ -20,23 +35,44 @@ from .serializers import (CustomUserSerializer,
                           SubscribeSerializer,
                           FollowSerializer,
                           FavoriteSerializer,
-                          CartSerializer)
+                          CartSerializer,
+                          BulkIdsSerializer)
+from .renderers import SHOPPING_LIST_RENDERERS
+from . import relations, shopping_list
+
+
+def get_limit(request, default, maximum):
+    """Значение параметра limit в пределах от 1 до maximum."""
+
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except ValueError:
+        raise ValidationError({'limit': 'Введите целое число.'})
+    return max(1, min(limit, maximum))
+
+
+def get_id_list(request, name):
+    """Список id из параметра вида ?name=1,2,3 или ?name=1&name=2."""
+
+    try:
+        return [
+            int(value)
+            for values in request.query_params.getlist(name)
+            for value in values.split(',') if value.strip()
+        ]
+    except ValueError:
+        raise ValidationError({name: 'Введите список целых чисел.'})
 
 
 class CustomUserViewSet(UserMixin):
 
     serializer_class = CustomUserSerializer
     permission_classes = [UserPermission, ]
+    pagination_class = FeedPagination
+    cursor_ordering = ('id',)
 
     def get_queryset(self):
-        queryset = CustomUser.objects.all().annotate(
-            is_subscribed=Exists(Follow.objects.filter(
-                user=self.request.user,
-                following=OuterRef('pk'))
-            )
-        )
-        return queryset
-
+        return get_users_queryset(self.request.user).order_by('id')
 
     @action(["get"], detail=False,
             permission_classes=[permissions.IsAuthenticated])
@@ -65,78 +101,187 @@ class CustomUserViewSet(UserMixin):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TagViewSet(ReadOnlyMixin):
+class TagViewSet(CatalogueMixin, ReadOnlyMixin):
+    catalogue = tags_catalogue
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class IngredientViewSet(ReadOnlyMixin):
+class IngredientViewSet(CatalogueMixin, ReadOnlyMixin):
+    """Список ингредиентов с автодополнением по параметру name.
+
+    Поиск выполняется по индексу в памяти процесса: сначала
+    совпадения по началу названия, затем по подстроке.
+    Число результатов ограничивается параметром limit.
+    """
+
+    catalogue = ingredients_catalogue
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (IngredientSearchFilter,)
-    search_fields = ('^name',)
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        limit = get_limit(request, settings.INGREDIENT_AUTOCOMPLETE_LIMIT,
+                          settings.INGREDIENT_AUTOCOMPLETE_MAX_LIMIT)
+        return Response(ingredient_index_cache.get().search(name, limit))
+
+
+class RecipeViewSet(AnonymousCacheMixin, viewsets.ModelViewSet):
+    """Просмотр, создание, редактирование и удаление рецептов.
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    """Просмотр, создание, редактирование и удаление рецептов"""
+    Списки и страницы рецептов для анонимных пользователей отдаются
+    из кэша, который сбрасывается при изменении рецептов, тэгов
+    и ингредиентов. Параметр ordering выбирает порядок списка: новые
+    (по умолчанию), popular - по числу добавлений в избранное,
+    trending - по оценке, которую пересчитывает update_trending.
+    Каждому порядку соответствует индекс.
+    """
 
     permission_classes = (RecipePermission, )
     http_method_names = ('get', 'patch', 'post', 'delete')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    pagination_class = FeedPagination
+    response_cache = recipe_responses_cache
+    orderings = {
+        'new': ('-pub_date', '-id'),
+        'popular': ('-times_added_to_favorite', '-id'),
+        'trending': ('-trending_score', '-id'),
+    }
+
+    def get_ordering(self):
+        value = self.request.query_params.get('ordering', 'new')
+        if value not in self.orderings:
+            raise ValidationError({'ordering': 'Выберите одно из значений: '
+                                   + ', '.join(self.orderings) + '.'})
+        return self.orderings[value]
+
+    @property
+    def cursor_ordering(self):
+        """Порядок курсорного режима.
+
+        Курсор строится по колонкам порядка, а релевантность поиска -
+        вычисляемая оценка, поэтому поиск доступен только постранично.
+        """
+
+        if self.request.query_params.get('search', '').strip():
+            raise ValidationError(
+                {'cursor': 'Поиск не поддерживает курсорную пагинацию; '
+                           'используйте параметры page и limit.'}
+            )
+        return self.get_ordering()
+
+    def is_user_scoped_list(self):
+        """Отобран ли список по избранному или корзине пользователя."""
+
+        return self.request.user.is_authenticated and any(
+            name in self.request.query_params
+            for name in ('is_favorited', 'is_in_shopping_cart')
+        )
 
     def get_queryset(self):
-        if self.request.user.is_authenticated:
-            queryset = Recipe.objects.all().annotate(
-                is_favorited=Exists(Favorite.objects.filter(
-                    favorer=self.request.user,
-                    favorite=OuterRef('pk'))
-                ),
-                is_in_shopping_cart=Exists(Cart.objects.filter(
-                    buyer=self.request.user,
-                    purchase=OuterRef('pk'))
+        queryset = get_recipes_queryset().order_by(*self.get_ordering())
+        return queryset.prefetch_related(
+            Prefetch(
+                'recipe_ingredient',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
                 )
-            ).order_by('-pub_date').prefetch_related(Prefetch(
-                'author',
-                queryset=CustomUser.objects.all().annotate(
-                    is_subscribed=Exists(Follow.objects.filter(
-                        user=self.request.user,
-                        following=OuterRef('pk'))
-                    )
-                ),
-                to_attr='annotated_author'))
-        else:
-            queryset = Recipe.objects.all().order_by(
-                '-pub_date'
-            ).prefetch_related(Prefetch(
-                'author',
-                queryset=CustomUser.objects.all().annotate(
-                    is_subscribed=Value(False, output_field=BooleanField())
-                ),
-                to_attr='annotated_author'))
-        return queryset
+            ),
+            'tags'
+        )
 
     def get_serializer_class(self):
         if self.request.method in permissions.SAFE_METHODS:
             return ReadRecipeSerializer
         return WriteRecipeSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.update({
+            "relations": relations.get_relations(self.request.user),
+            "image_variant": 'card' if self.action == 'list' else 'full',
+        })
+        return context
+
+    @action(["get"], detail=False)
+    def match(self, request, *args, **kwargs):
+        """Рецепты, которые можно приготовить из имеющихся ингредиентов.
+
+        Параметр ingredients - id ингредиентов. Рецепты сортируются
+        по доле своих ингредиентов, которые есть у пользователя;
+        доля возвращается в поле match_ratio.
+        """
+
+        ingredient_ids = get_id_list(request, 'ingredients')
+        if not ingredient_ids:
+            raise ValidationError(
+                {'ingredients': 'Укажите хотя бы один ингредиент.'}
+            )
+        limit = get_limit(request, settings.RECIPE_MATCH_LIMIT,
+                          settings.RECIPE_MATCH_MAX_LIMIT)
+        matches = match_index_cache.get().match(ingredient_ids, limit)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for _, _, recipe_id in matches]
+        )
+        context = self.get_serializer_context()
+        context["image_variant"] = 'card'
+        data = []
+        for ratio, _, recipe_id in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            item = ReadRecipeSerializer(recipe, context=context).data
+            item['match_ratio'] = round(ratio, 4)
+            data.append(item)
+        return Response(data)
+
+    @action(["get"], detail=False,
+            permission_classes=[permissions.IsAuthenticated])
+    def feed(self, request, *args, **kwargs):
+        """Лента рецептов авторов, на которых подписан пользователь.
+
+        Страницы листаются курсором (параметры cursor и limit).
+        """
+
+        paginator = TimelinePagination()
+        limit = get_limit(request, api_settings.PAGE_SIZE,
+                          settings.MAX_PAGE_SIZE)
+        rows, has_next = timeline.get_page(
+            request.user, paginator.get_position(request), limit
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for _, recipe_id in rows]
+        )
+        context = self.get_serializer_context()
+        context["image_variant"] = 'card'
+        data = [
+            ReadRecipeSerializer(recipes[recipe_id], context=context).data
+            for _, recipe_id in rows if recipe_id in recipes
+        ]
+        return paginator.get_paginated_response(
+            request, data, rows[-1] if rows else None, has_next
+        )
+
 
 class SubscriptionsViewSet(ListMixin):
     serializer_class = FollowSerializer
+    pagination_class = FeedPagination
+    cursor_ordering = ('-id',)
+
+    def is_user_scoped_list(self):
+        return True
 
     def get_queryset(self):
         user = self.request.user
-        return user.follower.all().prefetch_related(
+        return user.follower.order_by('-id').prefetch_related(
             Prefetch(
                 "following",
-                queryset=CustomUser.objects.all().annotate(
-                    is_subscribed=Exists(Follow.objects.filter(
-                        user=self.request.user,
-                        following=OuterRef('pk'))
-                    ))
+                queryset=get_authors_queryset(user)
             ))
 
 
@@ -145,19 +290,19 @@ class SubscribeViewSet(CreateDestroyMixin):
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_user_queryset(self):
-        return CustomUser.objects.all().annotate(
-            is_subscribed=Exists(Follow.objects.filter(
-                user=self.request.user,
-                following=OuterRef('pk'))
-            ))
+        return get_users_queryset(self.request.user)
 
     def perform_create(self, serializer):
         user_id = self.kwargs.get("user_id")
         authors = self.get_user_queryset()
         following = get_object_or_404(authors, pk=user_id)
         following.is_subscribed = True
-        serializer.save(user=self.request.user,
-                        following=following)
+        # Подписка и заполнение ленты сохраняются вместе: без ленты
+        # повторная подписка отклонялась бы как дубликат.
+        with transaction.atomic():
+            serializer.save(user=self.request.user,
+                            following=following)
+            timeline.backfill(self.request.user, [following.pk])
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -177,7 +322,9 @@ class SubscribeViewSet(CreateDestroyMixin):
             )
         instance = Follow.objects.filter(user=self.request.user,
                                          following=following)
-        self.perform_destroy(instance)
+        with transaction.atomic():
+            self.perform_destroy(instance)
+            timeline.remove_authors(self.request.user, [following.pk])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -202,15 +349,12 @@ class FavoriteViewSet(CreateDestroyMixin):
     def delete(self, *args, **kwargs):
         favorite = get_object_or_404(Recipe,
                                      pk=self.kwargs.get("recipe_id"))
-        if not Favorite.objects.filter(favorer=self.request.user,
-                                       favorite=favorite).exists():
+        instance = Favorite.objects.filter(favorer=self.request.user,
+                                           favorite=favorite).first()
+        if instance is None:
             raise ValidationError(
                 'Этого рецепта нет в избранном.'
             )
-        instance = Favorite.objects.filter(favorer=self.request.user,
-                                           favorite=favorite)
-        favorite.times_added_to_favorite -= 1
-        favorite.save()
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -246,30 +390,211 @@ class CartViewSet(CreateDestroyMixin):
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-@api_view(['GET', ])
-def download_purchase_list(request):
-    """выводит список покупок в формате .pdf"""
-
-    user = request.user
-    recipes_in_cart = enumerate(user.purchases.all())
-    ingredient_dict = {}
-    for res in recipes_in_cart:
-        ingr_in_recipe_list = res[1].recipe_ingredient.all()
-        for ingr in enumerate(ingr_in_recipe_list):
-            if ingr[1].ingredient.name not in ingredient_dict:
-                ingredient_dict[ingr[1].ingredient.name] = [
-                    int(ingr[1].amount),
-                    ingr[1].ingredient.measurement_unit
-                ]
-            else:
-                ingredient_dict[ingr[1].ingredient.name][0] += (
-                    int(ingr[1].amount)
+
+class BulkRelationView(APIView):
+    """Пакетное добавление и удаление связей пользователя с объектами.
+
+    POST добавляет, DELETE удаляет связи с объектами из списка ids
+    в одной транзакции: добавление - одним bulk_create, удаление -
+    одним DELETE по заблокированным строкам. В ответе для каждого id
+    указан статус: created, exists, not_found, forbidden - при
+    добавлении, deleted, absent - при удалении.
+
+    Зависимые данные в базе меняются методами add_related
+    и remove_related в той же транзакции, кэши сбрасываются методами
+    after_add и after_remove после ее фиксации.
+    """
+
+    permission_classes = (permissions.IsAuthenticated,)
+    model = None
+    target_model = None
+    user_field = None
+    target_field = None
+
+    def get_ids(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['ids']
+
+    def get_relations(self, user, ids):
+        return self.model.objects.filter(**{
+            self.user_field: user, f'{self.target_field}__in': ids
+        })
+
+    def get_related_ids(self, user, ids):
+        return set(self.get_relations(user, ids).values_list(
+            f'{self.target_field}_id', flat=True
+        ))
+
+    def is_allowed(self, user, target_id):
+        return True
+
+    def response(self, ids, statuses):
+        return Response({'results': [
+            {'id': target_id, 'status': statuses[target_id]}
+            for target_id in ids
+        ]})
+
+    def make_relation(self, user, target_id):
+        return self.model(**{self.user_field: user,
+                             f'{self.target_field}_id': target_id})
+
+    def insert(self, user, ids, statuses):
+        """Добавляет связи; не добавленным ставит статус exists.
+
+        Если ту же связь успела добавить параллельная транзакция,
+        bulk_create дает IntegrityError. Тогда строки добавляются
+        по одной, и статус created остается только у добавленных.
+        """
+
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create([
+                    self.make_relation(user, target_id) for target_id in ids
+                ])
+            return
+        except IntegrityError:
+            pass
+        for target_id in ids:
+            try:
+                with transaction.atomic():
+                    self.model.objects.bulk_create(
+                        [self.make_relation(user, target_id)]
+                    )
+            except IntegrityError:
+                statuses[target_id] = 'exists'
+
+    def post(self, request, *args, **kwargs):
+        ids = self.get_ids(request)
+        user = request.user
+        with transaction.atomic():
+            found = set(self.target_model.objects.filter(
+                pk__in=ids
+            ).values_list('pk', flat=True))
+            existing = self.get_related_ids(user, found)
+            statuses = {}
+            for target_id in ids:
+                if target_id not in found:
+                    statuses[target_id] = 'not_found'
+                elif target_id in existing:
+                    statuses[target_id] = 'exists'
+                elif not self.is_allowed(user, target_id):
+                    statuses[target_id] = 'forbidden'
+                else:
+                    statuses[target_id] = 'created'
+            self.insert(user, [
+                target_id for target_id in ids
+                if statuses[target_id] == 'created'
+            ], statuses)
+            created = [target_id for target_id in ids
+                       if statuses[target_id] == 'created']
+            if created:
+                self.add_related(user, created)
+                transaction.on_commit(lambda: self.after_add(user, created))
+        return self.response(ids, statuses)
+
+    def delete(self, request, *args, **kwargs):
+        ids = self.get_ids(request)
+        user = request.user
+        with transaction.atomic():
+            # Строки блокируются до удаления: параллельный запрос
+            # дождется фиксации и не найдет их, поэтому зависимые
+            # данные меняются только одним из запросов.
+            rows = dict(self.get_relations(user, ids).select_for_update(
+            ).order_by('pk').values_list('pk', f'{self.target_field}_id'))
+            present = set(rows.values())
+            self.model.objects.filter(pk__in=rows).delete()
+            removed = [target_id for target_id in ids if target_id in present]
+            if removed:
+                self.remove_related(user, removed)
+                transaction.on_commit(
+                    lambda: self.after_remove(user, removed)
                 )
+        return self.response(ids, {
+            target_id: 'deleted' if target_id in present else 'absent'
+            for target_id in ids
+        })
+
+    def add_related(self, user, ids):
+        pass
+
+    def remove_related(self, user, ids):
+        pass
+
+    def after_add(self, user, ids):
+        pass
+
+    def after_remove(self, user, ids):
+        pass
+
 
-    file_data = 'Список ингредиентов для покупки:\n'
-    for elm in ingredient_dict:
-        file_data += f'- {elm} ({ingredient_dict[elm][1]}): {ingredient_dict[elm][0]}\n'
-    response = FileResponse(file_data,
-                            status=status.HTTP_201_CREATED)
-    response['Content-type'] = 'application/text charset=utf-8',
+class BulkFavoriteView(BulkRelationView):
+    model = Favorite
+    target_model = Recipe
+    user_field = 'favorer'
+    target_field = 'favorite'
+
+    def add_related(self, user, ids):
+        Recipe.objects.filter(pk__in=ids).update(
+            times_added_to_favorite=F('times_added_to_favorite') + 1
+        )
+
+    def remove_related(self, user, ids):
+        Recipe.objects.filter(pk__in=ids).update(
+            times_added_to_favorite=F('times_added_to_favorite') - 1
+        )
+
+    def after_add(self, user, ids):
+        relations.invalidate([user.pk])
+
+
+class BulkCartView(BulkRelationView):
+    model = Cart
+    target_model = Recipe
+    user_field = 'buyer'
+    target_field = 'purchase'
+
+    def after_add(self, user, ids):
+        shopping_list.invalidate([user.pk])
+        relations.invalidate([user.pk])
+
+
+class BulkSubscribeView(BulkRelationView):
+    model = Follow
+    target_model = CustomUser
+    user_field = 'user'
+    target_field = 'following'
+
+    def is_allowed(self, user, target_id):
+        return target_id != user.pk
+
+    def add_related(self, user, ids):
+        timeline.backfill(user, ids)
+
+    def remove_related(self, user, ids):
+        timeline.remove_authors(user, ids)
+
+    def after_add(self, user, ids):
+        relations.invalidate([user.pk])
+
+
+@api_view(['GET', ])
+@renderer_classes(SHOPPING_LIST_RENDERERS)
+@permission_classes([permissions.IsAuthenticated])
+def download_purchase_list(request):
+    """Выводит список покупок в формате .txt, .csv или .pdf
+
+    Формат выбирается параметром запроса ?format=txt|csv|pdf.
+    """
+
+    renderer = request.accepted_renderer
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type = f'{content_type}; charset={renderer.charset}'
+    rows = shopping_list.get_shopping_list(request.user)
+    response = StreamingHttpResponse(renderer.stream(rows),
+                                     content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping-list.{renderer.format}"'
+    )
     return response
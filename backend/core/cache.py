@@ -0,0 +1,201 @@
+from threading import Lock
+from time import monotonic, time_ns
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'versioned_cache:{}'
+GENERATION_KEY = 'generation_cache:{}'
+CHANGE_LOG_KEY = 'versioned_cache_changes:{}'
+# Сколько изменений применяется по журналу; при большем числе данные
+# загружаются заново.
+CHANGE_LOG_MAX = 1000
+
+
+class VersionedCache:
+    """Кэш данных на уровне процесса с версией в общем кэше Django.
+
+    Данные хранятся в памяти процесса и перезагружаются функцией loader,
+    когда версия в общем кэше отличается от загруженной. Сброс меняет
+    версию, поэтому устаревшие данные обновляются во всех процессах,
+    если кэш Django общий для них (CACHE_BACKEND). С кэшем в памяти
+    процесса сброс из другого процесса, например из команды manage.py,
+    не виден, поэтому данные также перезагружаются, если они старше
+    VERSIONED_CACHE_TIMEOUT секунд.
+    Кэши с одинаковым именем используют общую версию и сбрасываются
+    вместе.
+    """
+
+    def __init__(self, name, loader):
+        self.key = VERSION_KEY.format(name)
+        self.loader = loader
+        self.lock = Lock()
+        self.state = (None, None, None)
+
+    def get_version(self):
+        version = cache.get(self.key)
+        if version is None:
+            cache.add(self.key, uuid4().hex, None)
+            version = cache.get(self.key)
+        return version
+
+    def is_fresh(self, state, version):
+        loaded_version, loaded_at, _ = state
+        return (
+            loaded_version == version
+            and monotonic() - loaded_at < settings.VERSIONED_CACHE_TIMEOUT
+        )
+
+    def get(self):
+        version = self.get_version()
+        state = self.state
+        if not self.is_fresh(state, version):
+            with self.lock:
+                state = self.state
+                if not self.is_fresh(state, version):
+                    state = (version, monotonic(), self.loader())
+                    self.state = state
+        return state[2]
+
+    def invalidate(self):
+        cache.set(self.key, uuid4().hex, None)
+
+
+class IncrementalVersionedCache(VersionedCache):
+    """VersionedCache с журналом изменений отдельных ключей.
+
+    changed(keys) записывает ключи в журнал в общем кэше Django под
+    очередным номером. get() передает ключи из записей после
+    примененного номера функции updater(data, keys), которая обновляет
+    данные на месте. Если записи журнала вытеснены, номер сброшен или
+    изменений больше CHANGE_LOG_MAX, данные загружаются заново.
+    invalidate() по-прежнему перезагружает данные целиком.
+    """
+
+    def __init__(self, name, loader, updater):
+        super().__init__(name, loader)
+        self.updater = updater
+        self.log_key = CHANGE_LOG_KEY.format(name)
+        self.applied = None
+
+    def get_sequence(self):
+        """Номер последнего изменения.
+
+        Начальный номер берется от текущего времени: после вытеснения
+        счетчика номер не вернется к уже примененным.
+        """
+
+        sequence = cache.get(self.log_key)
+        if sequence is None:
+            cache.add(self.log_key, time_ns(), None)
+            sequence = cache.get(self.log_key)
+        return sequence
+
+    def get_entry_key(self, number):
+        return f'{self.log_key}:{number}'
+
+    def changed(self, keys):
+        try:
+            number = cache.incr(self.log_key)
+        except ValueError:
+            cache.add(self.log_key, time_ns(), None)
+            number = cache.incr(self.log_key)
+        # Записи нужны процессам, чьи данные моложе
+        # VERSIONED_CACHE_TIMEOUT: более старые загружаются заново.
+        cache.set(self.get_entry_key(number), list(keys),
+                  settings.VERSIONED_CACHE_TIMEOUT)
+
+    def read_changes(self, sequence):
+        """Ключи изменений после примененного номера или None."""
+
+        if (self.applied is None or sequence < self.applied
+                or sequence - self.applied > CHANGE_LOG_MAX):
+            return None
+        entry_keys = [self.get_entry_key(number)
+                      for number in range(self.applied + 1, sequence + 1)]
+        entries = cache.get_many(entry_keys)
+        if len(entries) < len(entry_keys):
+            return None
+        return {key for keys in entries.values() for key in keys}
+
+    def get(self):
+        version = self.get_version()
+        sequence = self.get_sequence()
+        state = self.state
+        if self.is_fresh(state, version) and self.applied == sequence:
+            return state[2]
+        with self.lock:
+            state = self.state
+            if not self.is_fresh(state, version):
+                changes = None
+            elif self.applied == sequence:
+                return state[2]
+            else:
+                changes = self.read_changes(sequence)
+            if changes is None:
+                # Номер читается до загрузки: изменения, записанные
+                # во время загрузки, будут применены повторно.
+                state = (version, monotonic(), self.loader())
+                self.state = state
+            else:
+                self.updater(state[2], changes)
+            self.applied = sequence
+        return state[2]
+
+
+class GenerationCache:
+    """Кэш ответов с номером поколения в ключе.
+
+    Номер поколения хранится в общем кэше Django. Сброс увеличивает
+    номер, и все ранее сохраненные записи перестают находиться
+    без перебора ключей; они удаляются из кэша по истечении timeout.
+    Начальный номер берется от текущего времени, чтобы после вытеснения
+    счетчика из кэша не вернуться к номеру со старыми записями.
+
+    Кроме общего поколения у записей может быть поколение области
+    (scope), например пользователя: invalidate(scope) сбрасывает только
+    записи этой области, invalidate() - все записи кэша.
+    """
+
+    def __init__(self, name, timeout):
+        self.name = name
+        self.key = GENERATION_KEY.format(name)
+        self.timeout = timeout
+
+    def get_generation_keys(self, scope=None):
+        if scope is None:
+            return [self.key]
+        return [self.key, f'{self.key}:{scope}']
+
+    def get_generations(self, scope=None):
+        keys = self.get_generation_keys(scope)
+        generations = cache.get_many(keys)
+        for key in keys:
+            if key not in generations:
+                cache.add(key, time_ns(), None)
+                generations[key] = cache.get(key)
+        return [generations[key] for key in keys]
+
+    def make_key(self, key, scope=None):
+        """Ключ записи в текущем поколении.
+
+        Ключ вычисляется до построения ответа: если кэш сбросят, пока
+        ответ строится, запись попадет в уже устаревшее поколение.
+        """
+
+        generation = ':'.join(map(str, self.get_generations(scope)))
+        return f'{self.name}:{generation}:{key}'
+
+    def get(self, versioned_key):
+        return cache.get(versioned_key)
+
+    def set(self, versioned_key, value):
+        cache.set(versioned_key, value, self.timeout)
+
+    def invalidate(self, scope=None):
+        key = self.get_generation_keys(scope)[-1]
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time_ns(), None)
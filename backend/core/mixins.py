@@ -1,3 +1,9 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
 from rest_framework import mixins, viewsets
 
 
@@ -23,4 +29,89 @@ class CreateDestroyMixin(
         mixins.CreateModelMixin,
         mixins.DestroyModelMixin,
         viewsets.GenericViewSet):
-    pass
\ No newline at end of file
+    pass
+
+
+class CatalogueMixin:
+    """Отдает список из заранее сериализованного справочника.
+
+    Атрибут catalogue - кэш, возвращающий пару (тело JSON, ETag).
+    На запрос с совпадающим If-None-Match отвечает 304.
+    """
+
+    catalogue = None
+
+    def list(self, request, *args, **kwargs):
+        body, etag = self.catalogue.get()
+        response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, public=True,
+                            max_age=settings.CATALOGUE_MAX_AGE)
+        return get_conditional_response(request, etag=etag,
+                                        response=response)
+
+
+class AnonymousCacheMixin:
+    """Кэширует ответы list и retrieve для анонимных пользователей.
+
+    Атрибут response_cache - GenerationCache. Ключ строится из действия,
+    pk, схемы и хоста запроса (от них зависят абсолютные ссылки
+    в ответе), выбранного типа ответа и отсортированных параметров
+    запроса, поэтому ?tags=a&tags=b и ?tags=b&tags=a попадают в одну
+    запись. Заголовок Vary перечисляет заголовки запроса, от которых
+    зависит ключ. Анонимным ответам выставляется public Cache-Control
+    для nginx, ответам авторизованным пользователям - private.
+    """
+
+    vary_headers = ('Accept', 'Authorization', 'Host')
+
+    response_cache = None
+
+    def get_response_cache_key(self, request):
+        params = sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+        )
+        raw = repr((self.action, self.kwargs.get(self.lookup_field),
+                    request.scheme, request.get_host(),
+                    request.accepted_media_type, params))
+        return self.response_cache.make_key(
+            md5(raw.encode()).hexdigest()
+        )
+
+    def patch_response_headers(self, request, response):
+        patch_vary_headers(response, self.vary_headers)
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True)
+        else:
+            patch_cache_control(response, public=True,
+                                max_age=settings.ANONYMOUS_CACHE_MAX_AGE)
+        return response
+
+    def cached_response(self, request, action, *args, **kwargs):
+        if request.user.is_authenticated:
+            return self.patch_response_headers(
+                request, action(request, *args, **kwargs)
+            )
+        key = self.get_response_cache_key(request)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return self.patch_response_headers(
+                request, HttpResponse(content, content_type=content_type)
+            )
+        response = action(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(
+                lambda rendered: self.response_cache.set(
+                    key, (rendered.content, rendered['Content-Type'])
+                )
+            )
+        return self.patch_response_headers(request, response)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve,
+                                    *args, **kwargs)
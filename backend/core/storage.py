@@ -0,0 +1,38 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, называющее файлы по SHA-256 содержимого.
+
+    Файл сохраняется как <каталог>/ab/cd/<хэш><расширение>, где каталог
+    задается upload_to поля, а ab и cd - первые символы хэша. Если такой
+    файл уже есть, запись пропускается, и одинаковые изображения
+    хранятся один раз. Содержимое файла по имени не меняется, поэтому
+    его можно кэшировать без ограничения срока.
+    """
+
+    def get_blob_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        blob = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            directory, blob[:2], blob[2:4], f'{blob}{extension}'
+        ).replace('\\', '/')
+
+    def _save(self, name, content):
+        name = self.get_blob_name(name, content)
+        if self.exists(name):
+            # Время изменения обновляется, чтобы clean_images --min-age
+            # не удалил файл, на который только что сослался новый рецепт.
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
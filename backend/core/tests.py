@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from .cache import IncrementalVersionedCache
+from .storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTest(SimpleTestCase):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def tearDown(self):
+        shutil.rmtree(self.location, ignore_errors=True)
+
+    def test_same_content_is_stored_once(self):
+        first = self.storage.save('recipes/a.png', ContentFile(b'image'))
+        second = self.storage.save('recipes/b.PNG', ContentFile(b'image'))
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith('recipes/'))
+        self.assertTrue(first.endswith('.png'))
+        self.assertEqual(len(os.listdir(os.path.dirname(
+            self.storage.path(first)
+        ))), 1)
+
+    def test_existing_blob_is_touched(self):
+        name = self.storage.save('recipes/a.png', ContentFile(b'image'))
+        path = self.storage.path(name)
+        os.utime(path, (0, 0))
+        self.storage.save('recipes/b.png', ContentFile(b'image'))
+        self.assertGreater(os.path.getmtime(path), 0)
+
+
+class IncrementalVersionedCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.loads = 0
+        self.updates = []
+        self.cache = IncrementalVersionedCache(
+            'test', self.load, lambda data, keys: self.updates.append(keys)
+        )
+
+    def load(self):
+        self.loads += 1
+        return {}
+
+    def test_changes_are_applied(self):
+        self.cache.get()
+        self.cache.changed([1, 2])
+        self.cache.changed([2, 3])
+        self.cache.get()
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(self.updates, [{1, 2, 3}])
+
+    def test_lost_changes_reload(self):
+        self.cache.get()
+        self.cache.changed([1])
+        cache.delete(self.cache.get_entry_key(cache.get(self.cache.log_key)))
+        self.cache.get()
+        self.assertEqual(self.loads, 2)
+        self.assertEqual(self.updates, [])
+
+    def test_invalidate_reloads(self):
+        self.cache.get()
+        self.cache.invalidate()
+        self.cache.get()
+        self.assertEqual(self.loads, 2)
@@ -93,11 +93,76 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        # Для SQLite без DB_TEST_NAME тестовая база создается в памяти,
+        # и тесты с потоками пропускаются.
+        'TEST': {'NAME': os.getenv('DB_TEST_NAME')},
     }
 }
 
 
+# По умолчанию используется локальная память процесса. Для нескольких
+# воркеров gunicorn и для сброса кэшей командами manage.py нужен общий
+# бэкенд; в infra/docker-compose.yml это memcached:
+# CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+# и CACHE_LOCATION=memcached:11211.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60 * 24
+# Предельный возраст данных core.cache.VersionedCache в процессе.
+VERSIONED_CACHE_TIMEOUT = 60 * 5
+USER_RELATIONS_CACHE_TIMEOUT = 60 * 60 * 24
+
+INGREDIENT_AUTOCOMPLETE_LIMIT = 20
+INGREDIENT_AUTOCOMPLETE_MAX_LIMIT = 100
+
+# Сортировка ordering=trending: период полураспада вклада события
+# и веса добавления в избранное и в корзину.
+TRENDING_HALF_LIFE_HOURS = 72
+TRENDING_FAVORITE_WEIGHT = 2
+TRENDING_CART_WEIGHT = 1
+# update_trending учитывает события не новее запуска минус задержка:
+# строки с более ранней датой добавления успевают зафиксироваться.
+TRENDING_UPDATE_DELAY = 60
+
+# Лента подписок: рецепты авторов, у которых подписчиков больше
+# FEED_FANOUT_MAX_FOLLOWERS, не записываются в ленты, а читаются при
+# запросе. При подписке в ленту добавляются FEED_BACKFILL_LIMIT
+# последних рецептов автора.
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+FEED_BACKFILL_LIMIT = 100
+
+# Наибольшее число id в одном запросе пакетного добавления
+# в избранное, корзину и подписки.
+BULK_MAX_ITEMS = 100
+
+RECIPE_MATCH_LIMIT = 6
+RECIPE_MATCH_MAX_LIMIT = 100
+
+CATALOGUE_MAX_AGE = 60 * 5
+
+# Ответы на анонимные запросы к рецептам: время хранения в кэше Django
+# и max-age в Cache-Control для nginx.
+ANONYMOUS_CACHE_TIMEOUT = 60 * 10
+ANONYMOUS_CACHE_MAX_AGE = 60
+
+# Наибольшее число результатов поиска по индексу в памяти процесса,
+# который заменяет полнотекстовый поиск на СУБД, отличных от PostgreSQL.
+SEARCH_MAX_RESULTS = 1000
+
+MAX_PAGE_SIZE = 100
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = 10000
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -138,7 +203,27 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Изображения рецептов: ограничения на загрузку и число потоков,
+# строящих уменьшенные варианты.
+IMAGE_MAX_SIZE = 5 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+# Изображение приходит в JSON в base64, поэтому тело запроса
+# должно вмещать его вместе с остальными полями рецепта.
+DATA_UPLOAD_MAX_MEMORY_SIZE = IMAGE_MAX_SIZE * 4 // 3 + 1024 * 1024
+
+PDF_FONT_PATH = os.getenv(
+    'PDF_FONT_PATH',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny', 
     ],
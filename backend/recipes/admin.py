@@ -1,7 +1,17 @@
 from django.contrib import admin
+from django.db import transaction
+
+from .matching import match_index_cache
 from .models import Recipe, Ingredient, RecipeIngredient, Tag, Favorite, Cart
 
 
+def update_match_index(recipe_ids):
+    """Обновляет рецепты в индексе подбора после фиксации транзакции."""
+
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: match_index_cache.changed(recipe_ids))
+
+
 class IngredientInline(admin.StackedInline):
     model = RecipeIngredient
     extra = 5
@@ -12,6 +22,29 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = ['name', 'author', 'times_added_to_favorite']
     list_filter = ['name', 'author', 'tags']
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        update_match_index([form.instance.pk])
+
+
+class RecipeIngredientAdmin(admin.ModelAdmin):
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        recipe_ids = {obj.recipe_id}
+        if change and 'recipe' in form.changed_data:
+            recipe_ids.add(form.initial['recipe'])
+        update_match_index(recipe_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        update_match_index([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        update_match_index(recipe_ids)
+
 
 class TagAdmin(admin.ModelAdmin):
     list_display = ['name', ]
@@ -33,6 +66,6 @@ class FavoriteAdmin(admin.ModelAdmin):
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Tag, TagAdmin)
-admin.site.register(RecipeIngredient)
+admin.site.register(RecipeIngredient, RecipeIngredientAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
 admin.site.register(Cart)
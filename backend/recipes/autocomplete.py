@@ -0,0 +1,32 @@
+from bisect import bisect_left
+
+PREFIX_END = '\U0010ffff'
+
+
+class IngredientIndex:
+    """Отсортированный по названию индекс ингредиентов для автодополнения.
+
+    Совпадения по началу названия ищутся двоичным поиском, затем
+    список дополняется совпадениями по подстроке.
+    """
+
+    def __init__(self, ingredients):
+        self.items = sorted(
+            ingredients,
+            key=lambda item: (item['name'].lower(), item['id'])
+        )
+        self.keys = [item['name'].lower() for item in self.items]
+
+    def search(self, query, limit):
+        query = query.lower()
+        start = bisect_left(self.keys, query)
+        end = bisect_left(self.keys, query + PREFIX_END, lo=start)
+        results = self.items[start:min(end, start + limit)]
+        if len(results) < limit:
+            for position, key in enumerate(self.keys):
+                if start <= position < end or query not in key:
+                    continue
+                results.append(self.items[position])
+                if len(results) == limit:
+                    break
+        return results
@@ -0,0 +1,30 @@
+from django.conf import settings
+
+from core.cache import GenerationCache, VersionedCache
+
+from .autocomplete import IngredientIndex
+from .models import Ingredient, Tag
+
+
+def load_tags():
+    return {tag.slug: tag for tag in Tag.objects.all()}
+
+
+def load_ingredient_index():
+    return IngredientIndex(list(
+        Ingredient.objects.values('id', 'name', 'measurement_unit')
+    ))
+
+
+tags_cache = VersionedCache('tags', load_tags)
+ingredient_index_cache = VersionedCache('ingredients',
+                                        load_ingredient_index)
+recipe_responses_cache = GenerationCache(
+    'recipe_responses', settings.ANONYMOUS_CACHE_TIMEOUT
+)
+shopping_lists_cache = GenerationCache(
+    'shopping_list', settings.SHOPPING_LIST_CACHE_TIMEOUT
+)
+user_relations_cache = GenerationCache(
+    'user_relations', settings.USER_RELATIONS_CACHE_TIMEOUT
+)
@@ -0,0 +1,177 @@
+import base64
+import binascii
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+from threading import Lock
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .caches import recipe_responses_cache
+
+logger = logging.getLogger(__name__)
+
+# Размер варианта - максимальные ширина и высота с сохранением пропорций.
+VARIANTS = {
+    'thumb': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+VARIANT_FORMAT = 'WEBP'
+VARIANT_QUALITY = 80
+DECODE_CHUNK_SIZE = 64 * 1024
+SPOOL_SIZE = 1024 * 1024
+
+ready_names = set()
+pending_names = set()
+executor = None
+executor_lock = Lock()
+
+
+class ImageError(ValueError):
+    pass
+
+
+def decoded_size(payload):
+    """Размер данных base64 после декодирования, без декодирования."""
+
+    padding = payload[-2:].count('=')
+    return len(payload) * 3 // 4 - padding
+
+
+def decode_base64(payload, name):
+    """Декодирует base64 по частям во временный файл.
+
+    Пробелы и переводы строк, которые допускает base64 с переносами,
+    удаляются до разбиения на части. Размер проверяется до
+    декодирования. Декодированные данные хранятся в памяти
+    до SPOOL_SIZE, дальше - на диске.
+    """
+
+    payload = ''.join(payload.split())
+    if decoded_size(payload) > settings.IMAGE_MAX_SIZE:
+        raise ImageError(
+            f'Размер изображения больше {settings.IMAGE_MAX_SIZE} байт.'
+        )
+    file = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    try:
+        for start in range(0, len(payload), DECODE_CHUNK_SIZE):
+            file.write(base64.b64decode(
+                payload[start:start + DECODE_CHUNK_SIZE], validate=True
+            ))
+    except (binascii.Error, ValueError):
+        file.close()
+        raise ImageError('Некорректные данные base64.')
+    file.seek(0)
+    return File(file, name=name)
+
+
+def check_image(file):
+    """Проверяет заголовок изображения, не декодируя пиксели.
+
+    Полное декодирование выполняется при построении вариантов
+    в фоновом потоке.
+    """
+
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+            image_format = image.format
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ImageError('Файл не является изображением.')
+    finally:
+        file.seek(0)
+    if image_format not in settings.IMAGE_FORMATS:
+        raise ImageError(f'Формат {image_format} не поддерживается.')
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ImageError('Слишком большое разрешение изображения.')
+
+
+def variant_name(name, variant):
+    root, _ = os.path.splitext(name)
+    return f'{root}.{variant}.webp'
+
+
+def variants_ready(name):
+    """Готовы ли варианты изображения.
+
+    Положительный ответ запоминается в процессе: файлы вариантов
+    не перезаписываются, и однажды созданные остаются на месте.
+    """
+
+    if name in ready_names:
+        return True
+    if default_storage.exists(variant_name(name, 'thumb')):
+        ready_names.add(name)
+        return True
+    return False
+
+
+def generate_variants(name):
+    """Строит уменьшенные копии изображения в формате WebP.
+
+    Вариант thumb записывается последним: по нему проверяется
+    готовность всех вариантов.
+    """
+
+    with default_storage.open(name) as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        for variant in sorted(VARIANTS, key=lambda key: key == 'thumb'):
+            target = variant_name(name, variant)
+            if default_storage.exists(target):
+                continue
+            resized = image.copy()
+            resized.thumbnail(VARIANTS[variant], Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, VARIANT_FORMAT, quality=VARIANT_QUALITY)
+            default_storage.save(target, File(buffer))
+    ready_names.add(name)
+
+
+def process_image(name):
+    try:
+        generate_variants(name)
+    except Exception:
+        logger.exception('Не удалось построить варианты %s', name)
+        return
+    finally:
+        with executor_lock:
+            pending_names.discard(name)
+    recipe_responses_cache.invalidate()
+
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                thread_name_prefix='images'
+            )
+    return executor
+
+
+def schedule_variants(name):
+    """Ставит построение вариантов изображения в очередь пула потоков.
+
+    Наличие вариантов проверяется в хранилище, а не в памяти процесса:
+    их могла удалить команда clean_images. Одно изображение
+    не обрабатывается в процессе дважды одновременно.
+    """
+
+    if not name or default_storage.exists(variant_name(name, 'thumb')):
+        return
+    ready_names.discard(name)
+    pool = get_executor()
+    with executor_lock:
+        if name in pending_names:
+            return
+        pending_names.add(name)
+    pool.submit(process_image, name)
@@ -0,0 +1,85 @@
+import os
+from datetime import timedelta
+
+from django.core.management import BaseCommand, CommandError
+from django.utils import timezone
+from recipes.images import VARIANTS
+from recipes.models import RECIPE_IMAGES_DIR, Recipe
+
+DEFAULT_MIN_AGE = 60
+
+
+def walk(storage, path):
+    """Все файлы каталога хранилища, включая подкаталоги."""
+
+    directories, files = storage.listdir(path)
+    for file in files:
+        yield os.path.join(path, file).replace('\\', '/')
+    for directory in directories:
+        yield from walk(storage, os.path.join(path, directory))
+
+
+def source_root(name):
+    """Имя исходного файла без расширения для варианта изображения."""
+
+    root, extension = os.path.splitext(name)
+    root, variant = os.path.splitext(root)
+    if extension == '.webp' and variant[1:] in VARIANTS:
+        return root
+    return None
+
+
+class Command(BaseCommand):
+    """Удаляет изображения рецептов, на которые не ссылается ни один рецепт.\n
+    Текст команды:
+    'python manage.py clean_images [--dry-run] [--min-age 60]'
+    Вместе с изображением удаляются его уменьшенные варианты.
+    Файлы моложе --min-age минут не удаляются: рецепт с только что
+    загруженным изображением может быть еще не сохранен.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только вывести файлы, которые будут удалены."
+        )
+        parser.add_argument(
+            "--min-age", type=int, default=DEFAULT_MIN_AGE,
+            help="Минимальный возраст удаляемых файлов в минутах."
+        )
+
+    def handle(self, *args, **options):
+        if options["min_age"] < 0:
+            raise CommandError('--min-age must not be negative.')
+        storage = Recipe._meta.get_field('image').storage
+        directory = RECIPE_IMAGES_DIR.rstrip('/')
+        if not storage.exists(directory):
+            self.stdout.write(self.style.WARNING("No images found."))
+            return
+
+        referenced = set(
+            Recipe.objects.exclude(image='').values_list('image', flat=True)
+        )
+        referenced_roots = {os.path.splitext(name)[0] for name in referenced}
+        deadline = timezone.now() - timedelta(minutes=options["min_age"])
+        removed = kept = 0
+        for name in walk(storage, directory):
+            root = source_root(name)
+            if name in referenced or root in referenced_roots:
+                kept += 1
+                continue
+            if storage.get_modified_time(name) > deadline:
+                kept += 1
+                continue
+            removed += 1
+            if options["dry_run"]:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+
+        action = "Would remove" if options["dry_run"] else "Removed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{action} {removed} files, kept {kept}."
+            )
+        )
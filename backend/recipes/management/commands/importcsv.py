@@ -1,43 +1,217 @@
 import csv
+import json
+import os
+from itertools import islice
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
-from recipes.models import Ingredient
+from api.catalogue import ingredients_catalogue, tags_catalogue
+from recipes.caches import (ingredient_index_cache, recipe_responses_cache,
+                            tags_cache)
+from recipes.matching import match_index_cache
+from recipes.models import Ingredient, Tag
+
+FORMATS = ('csv', 'json')
+DEFAULT_BATCH_SIZE = 500
+JSON_READ_SIZE = 64 * 1024
+MODEL_FIELDS = {
+    'ingredients': ('name', 'measurement_unit'),
+    'tags': ('name', 'color', 'slug'),
+}
+
+
+def batched(iterable, size):
+    """Разбивает поток строк на пакеты заданного размера."""
+
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def read_csv(file, fields):
+    reader = csv.reader(file, delimiter=",")
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < len(fields):
+            raise CommandError(
+                f'Line {reader.line_num}: expected {len(fields)} fields '
+                f'({", ".join(fields)}), got {len(row)}.'
+            )
+        yield dict(zip(fields, row))
+
+
+def read_json(file, fields):
+    """Построчно читает объекты из JSON-массива, не загружая файл целиком."""
+
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    number = 0
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise CommandError('JSON file must contain an array.')
+            started = True
+            position += 1
+            continue
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Unexpected end of JSON file.')
+            chunk = file.read(JSON_READ_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        position = end
+        number += 1
+        if not isinstance(item, dict):
+            raise CommandError(f'Record {number}: expected an object.')
+        missing = [field for field in fields if field not in item]
+        if missing:
+            raise CommandError(
+                f'Record {number}: missing fields {", ".join(missing)}.'
+            )
+        yield {field: item[field] for field in fields}
+
+
+READERS = {'csv': read_csv, 'json': read_json}
 
 
 class Command(BaseCommand):
-    """Загружает модели в базу данных из файла CSV.\n
+    """Загружает ингредиенты и тэги в базу данных из файлов CSV или JSON.\n
     Текст команды:
     'python manage.py importcsv D:/Dev/foodgram-project-react/data/
-    (ваш путь к папке с файлами CSV)'
+    (ваш путь к папке с файлами ingredients.csv/.json и tags.csv/.json)'
+    Повторный запуск не создает дубликатов: ингредиенты сравниваются
+    по паре (name, measurement_unit), тэги - по slug.
     """
 
     def add_arguments(self, parser):
         parser.add_argument("csv_folder_path", type=str)
+        parser.add_argument(
+            "--format", choices=FORMATS, default=None,
+            help="Формат файлов. По умолчанию используется первый "
+                 "найденный: csv, затем json."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+            help="Число строк в одном пакете записи в базу."
+        )
 
     def handle(self, *args, **options):
         start_time = timezone.now()
         folder_path = options["csv_folder_path"]
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
 
-        # Импортируем ингредиенты
-        with open(
-            f'{folder_path}ingredients.csv', "r", encoding='utf-8'
-        ) as csv_file:
-            data = list(csv.reader(csv_file, delimiter=","))
-            for row in data[:]:
-                Ingredient.objects.create(
-                    name=row[0],
-                    measurement_unit=row[1]
+        for name, import_batch in (('ingredients', self.import_ingredients),
+                                   ('tags', self.import_tags)):
+            path, file_format = self.find_file(
+                folder_path, name, options["format"]
+            )
+            if path is None:
+                self.stdout.write(
+                    self.style.WARNING(f"No {name} file found, skipped.")
                 )
+                continue
+            self.import_file(path, file_format, name,
+                             import_batch, batch_size)
 
+        ingredient_index_cache.invalidate()
+        match_index_cache.invalidate()
+        ingredients_catalogue.invalidate()
+        tags_cache.invalidate()
+        tags_catalogue.invalidate()
+        recipe_responses_cache.invalidate()
+        end_time = timezone.now()
         self.stdout.write(
-            self.style.SUCCESS("Sucess importing ingredients.csv.")
+            self.style.SUCCESS(
+                f"Loading took: {(end_time-start_time).total_seconds()}"
+                " seconds."
+            )
         )
 
-        end_time = timezone.now()
+    def find_file(self, folder_path, name, file_format):
+        for candidate in (file_format,) if file_format else FORMATS:
+            path = os.path.join(folder_path, f'{name}.{candidate}')
+            if os.path.exists(path):
+                return path, candidate
+        return None, None
+
+    def import_file(self, path, file_format, name, import_batch, batch_size):
+        start_time = timezone.now()
+        processed = created = updated = 0
+        # Ошибка в любой строке откатывает импорт всего файла.
+        with open(path, "r", encoding='utf-8') as file, transaction.atomic():
+            rows = READERS[file_format](file, MODEL_FIELDS[name])
+            existing = self.load_existing(name)
+            try:
+                for batch in batched(rows, batch_size):
+                    batch_created, batch_updated = import_batch(
+                        batch, existing
+                    )
+                    processed += len(batch)
+                    created += batch_created
+                    updated += batch_updated
+                    self.stdout.write(f"{name}: {processed} rows processed")
+            except CommandError as error:
+                raise CommandError(f'{os.path.basename(path)}: {error}')
+
+        seconds = (timezone.now() - start_time).total_seconds()
+        rate = processed / seconds if seconds else processed
         self.stdout.write(
             self.style.SUCCESS(
-                f"Loading CSV took: {(end_time-start_time).total_seconds()}"
-                " seconds."
+                f"Sucess importing {os.path.basename(path)}: "
+                f"{processed} rows, {created} created, {updated} updated, "
+                f"{processed - created - updated} unchanged "
+                f"({rate:.0f} rows/s)."
             )
         )
+
+    def load_existing(self, name):
+        if name == 'ingredients':
+            return set(Ingredient.objects.values_list(
+                'name', 'measurement_unit'
+            ))
+        return {tag.slug: tag for tag in Tag.objects.all()}
+
+    def import_ingredients(self, batch, existing):
+        new = []
+        for row in batch:
+            key = (row['name'], row['measurement_unit'])
+            if key not in existing:
+                existing.add(key)
+                new.append(Ingredient(**row))
+        Ingredient.objects.bulk_create(new)
+        return len(new), 0
+
+    def import_tags(self, batch, existing):
+        new = []
+        changed = []
+        for row in batch:
+            tag = existing.get(row['slug'])
+            if tag is None:
+                tag = Tag(**row)
+                existing[tag.slug] = tag
+                new.append(tag)
+            elif (tag.name, tag.color) != (row['name'], row['color']):
+                tag.name = row['name']
+                tag.color = row['color']
+                if tag.pk and tag not in changed:
+                    changed.append(tag)
+        Tag.objects.bulk_create(new)
+        Tag.objects.bulk_update(changed, ['name', 'color'])
+        return len(new), len(changed)
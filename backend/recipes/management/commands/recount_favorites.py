@@ -0,0 +1,34 @@
+from django.core.management import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from recipes.models import Favorite, Recipe
+
+
+class Command(BaseCommand):
+    """Пересчитывает счетчики добавлений рецептов в избранное.\n
+    Текст команды:
+    'python manage.py recount_favorites'
+    """
+
+    def handle(self, *args, **options):
+        start_time = timezone.now()
+
+        favorites_count = Favorite.objects.filter(
+            favorite=OuterRef('pk')
+        ).order_by().values('favorite').annotate(
+            count=Count('pk')
+        ).values('count')
+        updated = Recipe.objects.update(
+            times_added_to_favorite=Coalesce(
+                Subquery(favorites_count, output_field=IntegerField()), 0
+            )
+        )
+
+        end_time = timezone.now()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recounted favorites for {updated} recipes in "
+                f"{(end_time-start_time).total_seconds()} seconds."
+            )
+        )
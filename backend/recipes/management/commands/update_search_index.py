@@ -0,0 +1,24 @@
+from django.core.management import BaseCommand
+from django.utils import timezone
+from recipes import search
+
+
+class Command(BaseCommand):
+    """Пересчитывает поисковые векторы всех рецептов.\n
+    Текст команды:
+    'python manage.py update_search_index'
+    Нужна после массовой загрузки рецептов или изменения ингредиентов
+    в обход приложения. На СУБД, отличных от PostgreSQL, сбрасывает
+    индекс в памяти процессов.
+    """
+
+    def handle(self, *args, **options):
+        start_time = timezone.now()
+        search.refresh()
+        end_time = timezone.now()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Search index updated in "
+                f"{(end_time-start_time).total_seconds()} seconds."
+            )
+        )
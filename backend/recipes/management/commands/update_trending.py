@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.utils import timezone
+from recipes import trending
+from recipes.caches import recipe_responses_cache
+
+
+class Command(BaseCommand):
+    """Обновляет оценки рецептов для сортировки ordering=trending.\n
+    Текст команды:
+    'python manage.py update_trending [--full]'
+    Запускается периодически (например, cron раз в несколько минут).
+    Учитываются только события избранного и корзины с датой добавления
+    после границы прошлого запуска; граница хранится в кэше Django.
+    Граница отстает от времени запуска на TRENDING_UPDATE_DELAY секунд:
+    дата добавления присваивается до фиксации транзакции, и строка
+    с датой до границы, зафиксированная после запуска, иначе
+    не попала бы ни в один интервал. Если границы нет или указан
+    --full, оценки считаются заново по всем событиям, что заодно
+    учитывает удаленные из избранного и корзины рецепты.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Пересчитать оценки по всем событиям."
+        )
+
+    def handle(self, *args, **options):
+        start_time = timezone.now()
+        until = start_time - timedelta(
+            seconds=settings.TRENDING_UPDATE_DELAY
+        )
+        since = None if options["full"] else trending.get_last_update()
+        if since is not None and since >= until:
+            updated = 0
+        else:
+            updated = trending.update_trending_scores(since, until)
+            trending.set_last_update(until)
+            recipe_responses_cache.invalidate()
+        end_time = timezone.now()
+        mode = "Incremental" if since else "Full"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{mode} update of {updated} recipes took "
+                f"{(end_time-start_time).total_seconds()} seconds."
+            )
+        )
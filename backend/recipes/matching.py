@@ -0,0 +1,99 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from core.cache import IncrementalVersionedCache
+
+from .models import RecipeIngredient
+
+
+class IngredientMatchIndex:
+    """Индекс «ингредиент -> рецепты» для подбора по имеющимся продуктам.
+
+    Для каждого ингредиента хранится отсортированный массив id
+    рецептов, для каждого рецепта - его ингредиенты. Совпадения
+    подсчитываются Counter.update по спискам рецептов (цикл на C),
+    поэтому затрагиваются только рецепты хотя бы с одним совпадением.
+    """
+
+    def __init__(self, rows):
+        postings = defaultdict(list)
+        recipes = defaultdict(list)
+        for recipe_id, ingredient_id in rows:
+            postings[ingredient_id].append(recipe_id)
+            recipes[recipe_id].append(ingredient_id)
+        self.postings = {
+            ingredient_id: array('q', sorted(recipe_ids))
+            for ingredient_id, recipe_ids in postings.items()
+        }
+        self.recipes = {
+            recipe_id: tuple(ingredient_ids)
+            for recipe_id, ingredient_ids in recipes.items()
+        }
+
+    def update(self, recipes):
+        """Заменяет ингредиенты рецептов.
+
+        recipes - словарь id рецепта -> id ингредиентов, пустой список
+        у удаленного рецепта. Массивы не изменяются, а заменяются
+        копиями: их могут читать match в других потоках.
+        """
+
+        for recipe_id, ingredient_ids in recipes.items():
+            old = set(self.recipes.get(recipe_id, ()))
+            new = set(ingredient_ids)
+            if new:
+                self.recipes[recipe_id] = tuple(new)
+            for ingredient_id in new - old:
+                posting = array('q', self.postings.get(ingredient_id, ()))
+                posting.insert(bisect_left(posting, recipe_id), recipe_id)
+                self.postings[ingredient_id] = posting
+            for ingredient_id in old - new:
+                posting = array('q', self.postings[ingredient_id])
+                del posting[bisect_left(posting, recipe_id)]
+                self.postings[ingredient_id] = posting
+            if not new:
+                self.recipes.pop(recipe_id, None)
+
+    def match(self, ingredient_ids, limit):
+        """До limit троек (доля совпадений, совпадения, id рецепта).
+
+        Доля - часть ингредиентов рецепта, которые есть у пользователя.
+        При равной доле выше рецепт с большим числом совпадений,
+        затем более новый.
+        """
+
+        matches = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matches.update(self.postings.get(ingredient_id, ()))
+        recipes = self.recipes
+        return heapq.nlargest(limit, (
+            (matched / len(recipes[recipe_id]), matched, recipe_id)
+            for recipe_id, matched in matches.items()
+            if recipe_id in recipes
+        ))
+
+
+def load_match_index():
+    return IngredientMatchIndex(
+        RecipeIngredient.objects.order_by().values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator()
+    )
+
+
+def update_match_index(index, recipe_ids):
+    """Перечитывает ингредиенты рецептов одним запросом."""
+
+    recipes = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+        recipe_id__in=recipes
+    ).values_list('recipe_id', 'ingredient_id'):
+        recipes[recipe_id].append(ingredient_id)
+    index.update(recipes)
+
+
+match_index_cache = IncrementalVersionedCache(
+    'recipe_match', load_match_index, update_match_index
+)
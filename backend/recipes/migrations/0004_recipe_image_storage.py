@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:38
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(help_text='Вставьте изображение готового блюда', storage=core.storage.ContentAddressedStorage(), upload_to='recipes/', verbose_name='Иллюстрация'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:42
+
+import datetime
+
+from django.db import migrations, models
+from django.utils.timezone import utc
+
+# Дата добавления для существующих строк: раньше любых событий, поэтому
+# старые связи не попадают в ordering=trending как только что созданные.
+CREATED_BACKFILL = datetime.datetime(2020, 1, 1, 0, 0, tzinfo=utc)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=CREATED_BACKFILL, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=CREATED_BACKFILL, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность за последнее время'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-times_added_to_favorite', '-id'], name='recipe_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-id'], name='recipe_trending_idx'),
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import F
+from core.storage import ContentAddressedStorage
 from users.models import CustomUser
 
 
@@ -6,6 +9,7 @@ NAME_LEN = 200
 SLUG_LEN = 200
 HEX_LEN = 7
 UNIT_LEN = 200
+RECIPE_IMAGES_DIR = 'recipes/'
 
 
 class Ingredient(models.Model):
@@ -81,6 +85,8 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Иллюстрация',
         help_text='Вставьте изображение готового блюда',
+        upload_to=RECIPE_IMAGES_DIR,
+        storage=ContentAddressedStorage(),
         blank=False,
         null=False
     )
@@ -131,6 +137,32 @@ class Recipe(models.Model):
         blank=True,
     )
     times_added_to_favorite = models.IntegerField(default=0)
+    trending_score = models.FloatField(
+        'Популярность за последнее время',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+    fanned_out = models.BooleanField(
+        'Разослан в ленты подписчиков',
+        default=True,
+        editable=False,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['-times_added_to_favorite', '-id'],
+                name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=['-trending_score', '-id'],
+                name='recipe_trending_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -176,19 +208,36 @@ class Favorite(models.Model):
         blank=False,
         null=False
     )
+    created = models.DateTimeField(
+        'Дата добавления', auto_now_add=True, db_index=True
+    )
+
+    def change_counter(self, delta):
+        """Атомарно изменяет счетчик добавлений рецепта в избранное."""
+
+        Recipe.objects.filter(pk=self.favorite_id).update(
+            times_added_to_favorite=F('times_added_to_favorite') + delta
+        )
 
     def save(self, *args, **kwargs):
-        if not self.pk:
-            recipe = Recipe.objects.get(pk=self.favorite.pk)
-            recipe.times_added_to_favorite += 1
-            recipe.save()
-        super(Favorite, self).save()
+        with transaction.atomic():
+            adding = self._state.adding
+            super(Favorite, self).save(*args, **kwargs)
+            if adding:
+                self.change_counter(1)
 
     def delete(self, *args, **kwargs):
-        recipe = Recipe.objects.get(pk=self.favorite.pk)
-        recipe.times_added_to_favorite -= 1
-        recipe.save()
-        super(Favorite, self).delete()
+        """Удаляет связь и уменьшает счетчик, если строка была удалена.
+
+        Экземпляр могла удалить параллельная транзакция: тогда DELETE
+        не удаляет ни одной строки, и счетчик не меняется.
+        """
+
+        with transaction.atomic():
+            result = super(Favorite, self).delete(*args, **kwargs)
+            if result[1].get(self._meta.label):
+                self.change_counter(-1)
+        return result
 
     class Meta:
         constraints = [models.UniqueConstraint(
@@ -213,6 +262,9 @@ class Cart(models.Model):
         blank=False,
         null=False
     )
+    created = models.DateTimeField(
+        'Дата добавления', auto_now_add=True, db_index=True
+    )
 
     class Meta:
         constraints = [models.UniqueConstraint(
@@ -221,3 +273,46 @@ class Cart(models.Model):
 
     def __str__(self):
         return f'Рецепт {self.purchase.name} в корзине {self.buyer.username}'
+
+
+class FeedEntry(models.Model):
+    """Запись ленты подписок: рецепт автора, на которого подписан user.
+
+    Записи создаются при публикации рецепта и при подписке на автора.
+    pub_date и author повторяют поля рецепта, чтобы лента читалась
+    и очищалась по индексам без соединения с рецептами.
+    """
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+        related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='feed_entries'
+    )
+    author = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='+'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'recipe'], name='unique_feed_entry'
+        )]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_entry_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'], name='feed_entry_user_author_idx'
+            ),
+        ]
@@ -0,0 +1,178 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, Value, When
+
+from core.cache import VersionedCache
+
+from .models import Recipe, RecipeIngredient
+
+SEARCH_CONFIG = 'russian'
+# Веса частей рецепта - как у setweight() в PostgreSQL.
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2}
+WORD_RE = re.compile(r'\w+')
+# Векторы рецептов одним запросом - как FILL_VECTORS в миграции 0005.
+UPDATE_VECTORS = """
+UPDATE recipes_recipe SET search_vector =
+    setweight(to_tsvector(%(config)s, coalesce(name, '')), 'A')
+    || setweight(to_tsvector(%(config)s, coalesce((
+        SELECT string_agg(ingredient.name, ' ' ORDER BY ingredient.name)
+        FROM recipes_recipeingredient recipe_ingredient
+        JOIN recipes_ingredient ingredient
+            ON ingredient.id = recipe_ingredient.ingredient_id
+        WHERE recipe_ingredient.recipe_id = recipes_recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector(%(config)s, coalesce(text, '')), 'C')
+"""
+
+
+def tokenize(text):
+    return WORD_RE.findall(text.lower().replace('ё', 'е'))
+
+
+def is_postgresql(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def get_documents(recipe_ids=None):
+    """Части рецептов для индекса: {id: (название, ингредиенты, текст)}."""
+
+    recipes = Recipe.objects.order_by()
+    ingredients = RecipeIngredient.objects.order_by('ingredient__name')
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+        ingredients = ingredients.filter(recipe__in=recipe_ids)
+    names = defaultdict(list)
+    for recipe_id, name in ingredients.values_list(
+        'recipe_id', 'ingredient__name'
+    ):
+        names[recipe_id].append(name)
+    return {
+        pk: (name, ' '.join(names[pk]), text)
+        for pk, name, text in recipes.values_list('pk', 'name', 'text')
+    }
+
+
+def update_vectors(recipe_ids=None):
+    """Обновляет поле search_vector рецептов в PostgreSQL одним запросом."""
+
+    sql = UPDATE_VECTORS
+    params = {'config': SEARCH_CONFIG}
+    if recipe_ids is not None:
+        sql += 'WHERE id = ANY(%(ids)s)'
+        params['ids'] = list(recipe_ids)
+    with connections['default'].cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def get_search_query(query):
+    """Запрос PostgreSQL: все слова запроса, каждое как префикс.
+
+    Слова выделяются так же, как в индексе в памяти, поэтому
+    результаты на разных СУБД совпадают. None - в запросе нет слов.
+    """
+
+    tokens = set(tokenize(query))
+    if not tokens:
+        return None
+    return SearchQuery(
+        ' & '.join(f'{token}:*' for token in sorted(tokens)),
+        config=SEARCH_CONFIG, search_type='raw'
+    )
+
+
+class SearchIndex:
+    """Инвертированный индекс рецептов в памяти процесса.
+
+    Используется вместо полнотекстового поиска PostgreSQL на других
+    СУБД. Слово запроса совпадает со словами индекса, которые с него
+    начинаются; рецепт должен содержать все слова запроса. Оценка -
+    сумма весов частей рецепта, в которых найдены слова.
+    """
+
+    def __init__(self, documents):
+        postings = defaultdict(lambda: defaultdict(float))
+        for pk, parts in documents.items():
+            for part, weight in zip(parts, WEIGHTS.values()):
+                for token in tokenize(part):
+                    postings[token][pk] += weight
+        self.terms = sorted(postings)
+        self.postings = [dict(postings[term]) for term in self.terms]
+
+    def match(self, token):
+        scores = defaultdict(float)
+        position = bisect_left(self.terms, token)
+        while (position < len(self.terms)
+               and self.terms[position].startswith(token)):
+            for pk, score in self.postings[position].items():
+                scores[pk] += score
+            position += 1
+        return scores
+
+    def search(self, query, limit):
+        """До limit пар (id рецепта, оценка) по убыванию оценки."""
+
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+        result = None
+        for token in tokens:
+            scores = self.match(token)
+            if result is None:
+                result = scores
+            else:
+                result = {pk: result[pk] + scores[pk]
+                          for pk in result.keys() & scores.keys()}
+            if not result:
+                return []
+        return sorted(result.items(),
+                      key=lambda item: (-item[1], -item[0]))[:limit]
+
+
+def load_search_index():
+    return SearchIndex(get_documents())
+
+
+search_index_cache = VersionedCache('recipe_search', load_search_index)
+
+
+def refresh(recipe_ids=None):
+    """Обновляет поисковые данные после изменения рецептов.
+
+    В PostgreSQL пересчитываются векторы указанных рецептов,
+    на других СУБД сбрасывается индекс в памяти.
+    """
+
+    if is_postgresql():
+        update_vectors(recipe_ids)
+    else:
+        search_index_cache.invalidate()
+
+
+def search_recipes(queryset, query):
+    """Отбирает рецепты по запросу и сортирует их по релевантности."""
+
+    if is_postgresql(queryset.db):
+        search_query = get_search_query(query)
+        if search_query is None:
+            return queryset.none()
+        queryset = queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        )
+    else:
+        ranked = search_index_cache.get().search(
+            query, settings.SEARCH_MAX_RESULTS
+        )
+        if not ranked:
+            return queryset.none()
+        queryset = queryset.filter(
+            pk__in=[pk for pk, _ in ranked]
+        ).annotate(rank=Case(
+            *[When(pk=pk, then=Value(score)) for pk, score in ranked],
+            output_field=FloatField()
+        ))
+    return queryset.order_by('-rank', '-pub_date', '-id')
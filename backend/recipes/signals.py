@@ -0,0 +1,143 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete,
+                                      post_migrate, post_save, pre_delete)
+from django.dispatch import receiver
+
+from api.catalogue import ingredients_catalogue, tags_catalogue
+from users.models import Follow
+
+from . import search
+from .caches import (ingredient_index_cache, recipe_responses_cache,
+                     shopping_lists_cache, tags_cache, user_relations_cache)
+from .images import schedule_variants
+from .matching import match_index_cache
+from .models import (Cart, Favorite, Ingredient, Recipe, RecipeIngredient,
+                     Tag)
+
+RELATION_USER_FIELDS = {
+    Favorite: 'favorer_id',
+    Cart: 'buyer_id',
+    Follow: 'user_id',
+}
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    tags_cache.invalidate()
+    tags_catalogue.invalidate()
+    invalidate_recipe_responses()
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredients(sender, instance, **kwargs):
+    ingredient_index_cache.invalidate()
+    ingredients_catalogue.invalidate()
+    invalidate_recipe_responses()
+    transaction.on_commit(shopping_lists_cache.invalidate)
+
+
+@receiver([post_save, pre_delete], sender=Ingredient)
+def refresh_ingredient_recipes(sender, instance, **kwargs):
+    """Обновляет поисковые данные рецептов с ингредиентом.
+
+    При удалении ингредиент убирается и из индекса подбора. Рецепты
+    выбираются до каскадного удаления строк RecipeIngredient, иначе
+    список оказался бы пустым.
+    """
+
+    recipe_ids = list(RecipeIngredient.objects.filter(
+        ingredient=instance
+    ).values_list('recipe_id', flat=True))
+    if not recipe_ids:
+        return
+    transaction.on_commit(lambda: search.refresh(recipe_ids))
+    if kwargs['signal'] is pre_delete:
+        transaction.on_commit(
+            lambda: match_index_cache.changed(recipe_ids)
+        )
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes(sender, **kwargs):
+    invalidate_recipe_responses()
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def refresh_search(sender, instance, **kwargs):
+    """Обновляет поисковые данные рецепта после фиксации транзакции.
+
+    К этому моменту записаны и ингредиенты рецепта.
+    """
+
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: search.refresh([recipe_id]))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_match_index(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: match_index_cache.changed([recipe_id]))
+
+
+@receiver(post_migrate)
+def reset_match_index(sender, **kwargs):
+    """Перестраивает индекс подбора после миграций приложения recipes."""
+
+    if sender.name == 'recipes':
+        match_index_cache.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_buyers_shopping_lists(sender, instance, created, **kwargs):
+    """Сбрасывает списки покупок пользователей с рецептом в корзине.
+
+    Покупатели выбираются после фиксации транзакции, когда записаны
+    и ингредиенты рецепта.
+    """
+
+    if created:
+        return
+    recipe_id = instance.pk
+
+    def invalidate():
+        for buyer_id in Cart.objects.filter(
+            purchase_id=recipe_id
+        ).values_list('buyer_id', flat=True):
+            shopping_lists_cache.invalidate(buyer_id)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver([post_save, post_delete], sender=Cart)
+def invalidate_shopping_list(sender, instance, **kwargs):
+    buyer_id = instance.buyer_id
+    transaction.on_commit(lambda: shopping_lists_cache.invalidate(buyer_id))
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+@receiver([post_save, post_delete], sender=Cart)
+@receiver([post_save, post_delete], sender=Follow)
+def invalidate_user_relations(sender, instance, **kwargs):
+    """Сбрасывает связи пользователя (api.relations) после фиксации."""
+
+    user_id = getattr(instance, RELATION_USER_FIELDS[sender])
+    transaction.on_commit(lambda: user_relations_cache.invalidate(user_id))
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, **kwargs):
+    """Строит варианты изображения после фиксации транзакции."""
+
+    name = instance.image.name
+    transaction.on_commit(lambda: schedule_variants(name))
+
+
+def invalidate_recipe_responses():
+    """Сбрасывает кэш анонимных ответов после фиксации транзакции.
+
+    Ингредиенты рецепта записываются после сохранения самого рецепта,
+    поэтому сброс до фиксации позволил бы закэшировать старые данные.
+    """
+
+    transaction.on_commit(recipe_responses_cache.invalidate)
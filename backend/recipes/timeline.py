@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from users.models import Follow
+
+from .models import FeedEntry, Recipe
+
+
+def publish(recipe):
+    """Раскладывает новый рецепт по лентам подписчиков автора.
+
+    Рецепты авторов, у которых подписчиков больше
+    FEED_FANOUT_MAX_FOLLOWERS, в ленты не записываются
+    (fanned_out=False) и добавляются в ленту при чтении.
+    """
+
+    followers = Follow.objects.filter(following=recipe.author_id)
+    if followers.count() > settings.FEED_FANOUT_MAX_FOLLOWERS:
+        Recipe.objects.filter(pk=recipe.pk).update(fanned_out=False)
+        recipe.fanned_out = False
+        return
+    FeedEntry.objects.bulk_create([
+        FeedEntry(user_id=user_id, recipe_id=recipe.pk,
+                  author_id=recipe.author_id, pub_date=recipe.pub_date)
+        for user_id in followers.values_list('user_id', flat=True)
+    ], ignore_conflicts=True)
+
+
+def backfill(user, author_ids):
+    """Добавляет в ленту последние рецепты авторов после подписки.
+
+    Рецепты всех авторов выбираются одним запросом: ROW_NUMBER
+    по автору оставляет FEED_BACKFILL_LIMIT последних у каждого.
+    """
+
+    if not author_ids:
+        return
+    ranked = Recipe.objects.filter(
+        author__in=author_ids, fanned_out=True
+    ).order_by().values('id', 'author_id', 'pub_date').annotate(
+        feed_rank=Window(
+            RowNumber(), partition_by=[F('author')],
+            order_by=[F('pub_date').desc(), F('id').desc()]
+        )
+    )
+    sql, params = ranked.query.sql_with_params()
+    recipes = Recipe.objects.raw(
+        f'SELECT * FROM ({sql}) ranked WHERE feed_rank <= %s',
+        [*params, settings.FEED_BACKFILL_LIMIT]
+    )
+    FeedEntry.objects.bulk_create([
+        FeedEntry(user=user, recipe_id=recipe.pk,
+                  author_id=recipe.author_id, pub_date=recipe.pub_date)
+        for recipe in recipes
+    ], ignore_conflicts=True)
+
+
+def remove_authors(user, author_ids):
+    """Убирает из ленты рецепты авторов после отписки."""
+
+    FeedEntry.objects.filter(user=user, author__in=author_ids).delete()
+
+
+def get_page(user, position, limit):
+    """Страница ленты: до limit пар (дата публикации, id рецепта).
+
+    position - пара последнего рецепта предыдущей страницы или None.
+    Записи ленты и рецепты авторов, читаемых при запросе, выбираются
+    двумя запросами по индексам и сливаются. Возвращает страницу
+    и признак наличия следующей.
+    """
+
+    entries = FeedEntry.objects.filter(user=user)
+    pulled = Recipe.objects.filter(
+        fanned_out=False,
+        author__in=Follow.objects.filter(user=user).values('following')
+    )
+    if position is not None:
+        pub_date, recipe_id = position
+        entries = entries.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, recipe_id__lt=recipe_id)
+        )
+        pulled = pulled.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, id__lt=recipe_id)
+        )
+    rows = sorted(
+        [*entries.order_by('-pub_date', '-recipe_id').values_list(
+            'pub_date', 'recipe_id'
+        )[:limit + 1],
+         *pulled.order_by('-pub_date', '-id').values_list(
+            'pub_date', 'id'
+        )[:limit + 1]],
+        reverse=True
+    )
+    return rows[:limit], len(rows) > limit
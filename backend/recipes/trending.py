@@ -0,0 +1,89 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cart, Favorite, Recipe
+
+LAST_UPDATE_KEY = 'trending:last_update'
+# Отсчет времени для оценок; выбран раньше любых событий.
+EPOCH = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+UPDATE_BATCH_SIZE = 500
+
+
+def event_exponent(created, weight):
+    """log2 вклада события в оценку.
+
+    Вклад события - weight * 2 ** (часы от EPOCH / период полураспада).
+    Все вклады растут с одной скоростью, поэтому порядок рецептов
+    по сумме вкладов совпадает с порядком по оценке с затуханием
+    на любой момент времени, и старые оценки не нужно пересчитывать.
+    """
+
+    hours = (created - EPOCH).total_seconds() / 3600
+    return math.log2(weight) + hours / settings.TRENDING_HALF_LIFE_HOURS
+
+
+def log2_sum(exponents):
+    """log2 суммы степеней двойки без переполнения."""
+
+    top = max(exponents)
+    return top + math.log2(sum(2 ** (value - top) for value in exponents))
+
+
+def collect_events(since, until):
+    """Показатели вкладов событий избранного и корзины по рецептам."""
+
+    events = defaultdict(list)
+    for model, recipe_field, weight in (
+        (Favorite, 'favorite_id', settings.TRENDING_FAVORITE_WEIGHT),
+        (Cart, 'purchase_id', settings.TRENDING_CART_WEIGHT),
+    ):
+        queryset = model.objects.filter(created__lte=until)
+        if since is not None:
+            queryset = queryset.filter(created__gt=since)
+        for recipe_id, created in queryset.values_list(
+            recipe_field, 'created'
+        ).iterator():
+            events[recipe_id].append(event_exponent(created, weight))
+    return events
+
+
+@transaction.atomic
+def update_trending_scores(since=None, until=None):
+    """Добавляет к оценкам рецептов события из интервала (since, until].
+
+    Оценка хранится как log2 суммы вкладов, рецепты без событий
+    имеют оценку 0. Без since оценки всех рецептов считаются заново.
+    Возвращает число обновленных рецептов.
+    """
+
+    until = until or timezone.now()
+    events = collect_events(since, until)
+    if since is None:
+        Recipe.objects.exclude(trending_score=0).update(trending_score=0)
+    recipes = list(Recipe.objects.filter(
+        pk__in=events.keys()
+    ).only('id', 'trending_score'))
+    for recipe in recipes:
+        exponents = events[recipe.pk]
+        if recipe.trending_score:
+            exponents.append(recipe.trending_score)
+        recipe.trending_score = log2_sum(exponents)
+    for start in range(0, len(recipes), UPDATE_BATCH_SIZE):
+        Recipe.objects.bulk_update(
+            recipes[start:start + UPDATE_BATCH_SIZE], ['trending_score']
+        )
+    return len(recipes)
+
+
+def get_last_update():
+    return cache.get(LAST_UPDATE_KEY)
+
+
+def set_last_update(value):
+    cache.set(LAST_UPDATE_KEY, value, None)